@@ -0,0 +1,152 @@
+import threading
+import weakref
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Optional, Tuple
+
+if TYPE_CHECKING:
+    from pdbpy.msf import MultiStreamFileStream
+
+
+class MemoryBudgetStats:
+    """
+    evictions: entries dropped to get back under the limit
+    evicted_bytes: bytes those entries held
+    released_ranges: ranges of the mapped file handed back to the OS with MADV_DONTNEED
+    released_bytes: bytes in those ranges
+    """
+
+    def __init__(self):
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.released_ranges = 0
+        self.released_bytes = 0
+
+    def __repr__(self):
+        return (
+            f"MemoryBudgetStats(evictions={self.evictions}, evicted_bytes={self.evicted_bytes}, "
+            f"released_ranges={self.released_ranges}, released_bytes={self.released_bytes})"
+        )
+
+
+class MemoryBudget:
+    """
+    Keeps the memory held by caches and indices of one or more PDBs under `limit_bytes`.
+
+    Give the same budget to every `PDB` (or `MultiStreamFile`) that should share the limit.
+    Anything that holds memory it can rebuild - stream chunk caches, parsed records, lookup indices -
+     `charge`s the budget for it under a key, and `touch`es the key when it's used again.
+    When the total goes over the limit, the least recently used entries are evicted by calling
+     `owner.budget_evict(key)`, after which the owner is expected to drop that memory.
+    Owners are only weakly referenced, and their entries go away with them.
+
+    With `release_scans`, the parts of the memory-mapped file that a sequential scan has moved past
+     are handed back to the OS with MADV_DONTNEED, so RSS doesn't grow with every page ever scanned.
+     They are still in the OS page cache, so touching them again is a minor fault, not a read.
+    """
+
+    def __init__(self, limit_bytes: int, release_scans: bool = True):
+        self.limit_bytes = limit_bytes
+        self.release_scans = release_scans
+        self.used_bytes = 0
+        self.stats = MemoryBudgetStats()
+
+        self._lock = threading.RLock()
+        # (owner_id, key) -> byte count, in LRU order
+        self._entries: OrderedDict[Tuple[int, Hashable], int] = OrderedDict()
+        self._owners: Dict[int, weakref.ref] = {}
+        # How far each scanned stream has been released.
+        self._scans: weakref.WeakKeyDictionary["MultiStreamFileStream", int] = weakref.WeakKeyDictionary()
+
+    def __repr__(self):
+        return f"MemoryBudget(used_bytes={self.used_bytes}, limit_bytes={self.limit_bytes}, stats={self.stats})"
+
+    def _owner_gone(self, owner_id: int) -> None:
+        with self._lock:
+            self._owners.pop(owner_id, None)
+            for entry in [entry for entry in self._entries if entry[0] == owner_id]:
+                self.used_bytes -= self._entries.pop(entry)
+
+    def charge(self, owner: Any, key: Hashable, byte_count: int) -> None:
+        """
+        Records that `owner` holds `byte_count` bytes under `key` (replacing what was charged for it before),
+         and evicts other entries if that puts the budget over the limit.
+        """
+        owner_id = id(owner)
+        with self._lock:
+            if owner_id not in self._owners:
+                self._owners[owner_id] = weakref.ref(owner, lambda _, owner_id=owner_id: self._owner_gone(owner_id))
+            entry = (owner_id, key)
+            self.used_bytes += byte_count - self._entries.pop(entry, 0)
+            self._entries[entry] = byte_count
+            self._enforce(keep=entry)
+
+    def touch(self, owner: Any, key: Hashable) -> None:
+        """
+        Marks the entry as recently used.
+        """
+        with self._lock:
+            entry = (id(owner), key)
+            if entry in self._entries:
+                self._entries.move_to_end(entry)
+
+    def discharge(self, owner: Any, key: Hashable) -> None:
+        """
+        Forgets the entry, for when the owner drops the memory on its own.
+        """
+        with self._lock:
+            self.used_bytes -= self._entries.pop((id(owner), key), 0)
+
+    def _enforce(self, keep: Optional[Tuple[int, Hashable]] = None) -> None:
+        # The entry that was just charged is kept, even if it's larger than the whole budget on its own.
+        while self.used_bytes > self.limit_bytes:
+            entry = next((entry for entry in self._entries if entry != keep), None)
+            if entry is None:
+                break
+            byte_count = self._entries.pop(entry)
+            self.used_bytes -= byte_count
+            self.stats.evictions += 1
+            self.stats.evicted_bytes += byte_count
+
+            owner_id, key = entry
+            owner = self._owners[owner_id]()
+            if owner is not None:
+                owner.budget_evict(key)
+
+    def set_limit(self, limit_bytes: int) -> None:
+        with self._lock:
+            self.limit_bytes = limit_bytes
+            self._enforce()
+
+    def release(self, stream: "MultiStreamFileStream", offset: int = 0, count: Optional[int] = None) -> int:
+        """
+        Hands the pages behind a range of `stream` back to the OS. Only does anything for memory-mapped files.
+        Returns the number of bytes released.
+        """
+        if count is None:
+            count = len(stream) - offset
+        parent = stream.parent
+        released = 0
+        for addr, length in parent.extent_ranges(stream.extents, byte_offset=offset, byte_count=count):
+            if parent.source.advise(addr, length, "dontneed"):
+                released += length
+                self.stats.released_ranges += 1
+        self.stats.released_bytes += released
+        return released
+
+    def on_sequential_read(self, stream: "MultiStreamFileStream", offset: int, count: int) -> None:
+        """
+        Called by scans (see `StreamCursor`) when they are about to read `count` bytes at `offset` of `stream`.
+        Everything the scan has moved past since the last call is released.
+        """
+        if not self.release_scans:
+            return
+        released_until = self._scans.get(stream, None)
+        if released_until is not None and released_until < offset:
+            self.release(stream, released_until, offset - released_until)
+            self._scans[stream] = offset
+        elif released_until is None or released_until > offset:
+            # New scan, or one that went back.
+            self._scans[stream] = offset
+
+
+__all__ = ("MemoryBudget", "MemoryBudgetStats")
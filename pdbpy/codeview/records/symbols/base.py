@@ -11,6 +11,9 @@ class SymbolBase(Structy):
     _record_length     : uint16_t 
     _record_type       : uint16_t # SymType
 
+    # The Python attributes that `from_memory` sets, which slotted variants need slots for.
+    extra_attributes = ()
+
     @property
     def record_length(self) -> int: return self._record_length # type: ignore
 
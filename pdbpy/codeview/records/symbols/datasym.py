@@ -1,11 +1,10 @@
-from ctypes import sizeof as c_sizeof
-
 from dtypes.structify import structify
 from dtypes.typedefs import uint16_t, uint32_t
 
 from pdbpy.codeview.symbols import SymEnum
 from pdbpy.codeview.types import type_index
 from pdbpy.parsing import read_pascalstring, read_stringz
+from pdbpy.utils.ctypes import header_size
 
 from .base import SymbolBase, associate_symbols
 
@@ -30,6 +29,8 @@ class DataSym(SymbolBase):
     _segment: uint16_t
     # name : str
 
+    extra_attributes = ("memory", "name")
+
     @property
     def offset(self) -> int:
         return self._offset  # type: ignore
@@ -40,7 +41,7 @@ class DataSym(SymbolBase):
 
     @classmethod
     def from_memory(cls, mem: memoryview, length: int, type: SymEnum) -> "DataSym":
-        my_size = c_sizeof(cls)
+        my_size = header_size(cls)
         self = cls.from_buffer_copy(mem[:my_size])
         self.memory = mem
 
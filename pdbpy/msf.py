@@ -1,12 +1,19 @@
 import ctypes
-import mmap
+import weakref
+from bisect import bisect_right
+from collections import OrderedDict
 from io import IOBase
-from typing import List, Optional, Sequence
+from itertools import accumulate
+from typing import List, Optional, Sequence, Tuple, TypeAlias, Union
 
 from dtypes.structify import Structy, structify
 from dtypes.typedefs import uint32_t
 from memorywrapper import MemoryWrapper
 
+from pdbpy.budget import MemoryBudget
+from pdbpy.pagesource import PageSource, make_page_source
+from pdbpy.prefetch import Prefetcher
+
 
 @structify
 class BigHeader(Structy):
@@ -40,6 +47,59 @@ class BigHeader(Structy):
         return self._directory_size_in_bytes  # type: ignore
 
 
+# A run of consecutive pages in the file, as (first_page, page_count).
+PageExtent: TypeAlias = Tuple[int, int]
+
+
+def coalesce_pages(page_list: Sequence[int]) -> List[PageExtent]:
+    """
+    Turns a page list into a list of (first_page, page_count)-runs of consecutive pages.
+    Linkers tend to write streams into long runs of pages, so this usually shrinks the list a lot.
+
+    >>> coalesce_pages([4, 5, 6, 9, 10, 2])
+    [(4, 3), (9, 2), (2, 1)]
+    """
+    extents: List[PageExtent] = []
+    run_start = -1
+    run_length = 0
+    for page in page_list:
+        if page == run_start + run_length:
+            run_length += 1
+            continue
+        if run_length:
+            extents.append((run_start, run_length))
+        run_start = page
+        run_length = 1
+    if run_length:
+        extents.append((run_start, run_length))
+    return extents
+
+
+class StreamReadStats:
+    """
+    Counts how reads of a `MultiStreamFileStream` were served.
+
+    contiguous: the range was inside one run of pages and got a zero-copy view into the file.
+    stitched: the range crossed runs and `read_view` had to copy it together.
+    wrapped: the range crossed runs and slicing handed out a (lazily copying) MemoryWrapper.
+    chunk_hits/chunk_misses: the range crossed runs but was served from the chunk cache,
+     see `MultiStreamFileStream.enable_chunk_cache`.
+    """
+
+    def __init__(self):
+        self.contiguous = 0
+        self.stitched = 0
+        self.wrapped = 0
+        self.chunk_hits = 0
+        self.chunk_misses = 0
+
+    def __repr__(self):
+        return (
+            f"StreamReadStats(contiguous={self.contiguous}, stitched={self.stitched}, wrapped={self.wrapped}, "
+            f"chunk_hits={self.chunk_hits}, chunk_misses={self.chunk_misses})"
+        )
+
+
 class MultiStreamFileStream(MemoryWrapper):
     """
     Usually created by `StreamDirectoryStream.get_stream_by_index`, which you'd do by
@@ -54,8 +114,24 @@ class MultiStreamFileStream(MemoryWrapper):
 
     Behaves like a MemoryWrapper - Initializer pulls memoryviews of the entire stream
      and wraps it up like a good boy! This makes copies delegated until they are needed.
+
+    The page list is coalesced into `extents` once, so there is one memoryview per run of
+     consecutive pages rather than one per page.
+    Slices that fall within a single run are returned as plain memoryviews into the file,
+     only slices that cross runs are returned as MemoryWrapper objects.
+    Use `read_view` to always get something buffer-like; `stats` counts which path was taken.
+
+    With `enable_chunk_cache` the stream instead stitches aligned chunks of itself into contiguous
+     buffers on first touch, and keeps them around in a LRU limited by a byte budget. That's the
+     middle ground between re-stitching on every access and copying the whole stream upfront.
+    If the parent has a `MemoryBudget`, the chunks are charged to it too, and it may evict them.
     """
 
+    chunk_size: int
+    chunk_budget_bytes: int
+    _chunks: Optional["OrderedDict[int, bytes]"]
+    _chunk_bytes: int
+
     def __init__(
         self,
         parent: "MultiStreamFile",
@@ -70,12 +146,157 @@ class MultiStreamFileStream(MemoryWrapper):
 
         self.parent = parent
         self.page_list = page_list
+        self.extents = coalesce_pages(page_list)
+        # Stream byte offset where each extent starts, with the total at the end, for bisecting.
+        self.extent_offsets = list(accumulate((count * parent.page_size for _, count in self.extents), initial=0))
         self.bytes = size_bytes
+        self.stats = StreamReadStats()
+
+        self.chunk_size = 0
+        self.chunk_budget_bytes = 0
+        self._chunks = None
+        self._chunk_bytes = 0
 
         self.streamname = streamname
         parent.children[streamname] = self
 
-        MemoryWrapper.__init__(self, sources=parent.map_pages(page_list), length=self.bytes)
+        # Nil streams have a size of 0xFFFFFFFF and no pages, so clamp to what the pages can hold.
+        mapped_bytes = min(size_bytes, len(page_list) * parent.page_size)
+        MemoryWrapper.__init__(self, sources=(), length=mapped_bytes)
+        # The sources are mapped on first use, so sources that fetch data don't fetch the whole stream upfront.
+        self._sources = None
+
+    @property
+    def memorywrapper_sources(self) -> Sequence[memoryview]:
+        if self._sources is None:
+            self._sources = self.parent.map_extents(self.extents, byte_count=len(self))
+        return self._sources
+
+    @memorywrapper_sources.setter
+    def memorywrapper_sources(self, sources: Sequence[memoryview]) -> None:
+        self._sources = sources
+
+    def enable_chunk_cache(self, chunk_size: int = 64 * 1024, budget_bytes: int = 32 * 1024 * 1024) -> None:
+        """
+        Serve reads that cross page runs from `chunk_size`-aligned chunks of the stream, stitched together
+         once and kept in a LRU of at most `budget_bytes` bytes (the most recent chunk is always kept).
+        """
+        assert chunk_size > 0, "Chunks need to be at least a byte large"
+        self.chunk_size = chunk_size
+        self.chunk_budget_bytes = budget_bytes
+        self._chunks = OrderedDict()
+        self._chunk_bytes = 0
+
+    def _chunk_view(self, offset: int, count: int) -> Optional[memoryview]:
+        """
+        Returns a view of the range from the chunk cache if the cache is enabled and the range is within one chunk.
+        """
+        chunks = self._chunks
+        if chunks is None:
+            return None
+        chunk_idx, local_offset = divmod(offset, self.chunk_size)
+        if local_offset + count > self.chunk_size:
+            return None
+
+        budget = self.budget
+        chunk = chunks.get(chunk_idx, None)
+        if chunk is None:
+            self.stats.chunk_misses += 1
+            chunk_start = chunk_idx * self.chunk_size
+            chunk_count = min(self.chunk_size, len(self) - chunk_start)
+            chunk = self.parent.read_extents(self.extents, byte_offset=chunk_start, byte_count=chunk_count)
+            chunks[chunk_idx] = chunk
+            self._chunk_bytes += len(chunk)
+            while self._chunk_bytes > self.chunk_budget_bytes and len(chunks) > 1:
+                evicted_idx, evicted = chunks.popitem(last=False)
+                self._chunk_bytes -= len(evicted)
+                if budget is not None:
+                    budget.discharge(self, ("chunk", evicted_idx))
+            if budget is not None:
+                budget.charge(self, ("chunk", chunk_idx), len(chunk))
+        else:
+            self.stats.chunk_hits += 1
+            chunks.move_to_end(chunk_idx)
+            if budget is not None:
+                budget.touch(self, ("chunk", chunk_idx))
+        return memoryview(chunk)[local_offset : local_offset + count]
+
+    @property
+    def budget(self) -> Optional[MemoryBudget]:
+        return self.parent.budget
+
+    def budget_evict(self, key) -> None:
+        """
+        Called by the `MemoryBudget` when it wants the memory charged under `key` back.
+        """
+        kind, chunk_idx = key
+        assert kind == "chunk", f"Don't know how to evict {key}"
+        chunk = self._chunks.pop(chunk_idx, None) if self._chunks is not None else None
+        if chunk is not None:
+            self._chunk_bytes -= len(chunk)
+
+    def contiguous_view(self, offset: int, count: int) -> Optional[memoryview]:
+        """
+        Returns a zero-copy view of `count` bytes at stream `offset` if they are all within one run of
+         consecutive pages, otherwise None.
+        """
+        extent_idx = bisect_right(self.extent_offsets, offset) - 1
+        if extent_idx >= len(self.extents) or offset + count > self.extent_offsets[extent_idx + 1]:
+            return None
+        first_page, _ = self.extents[extent_idx]
+        addr = first_page * self.parent.page_size + offset - self.extent_offsets[extent_idx]
+        return self.parent.source.read(addr, count)
+
+    def read_view(self, offset: int, count: int) -> memoryview:
+        """
+        The contiguous-view-or-stitched-copy primitive.
+        Returns a zero-copy view into the file if the range is within one run of pages,
+         otherwise the pages are copied together into a new buffer.
+        """
+        assert offset >= 0 and offset + count <= len(self), f"Can't read {count} bytes at {offset} of {len(self)}"
+        view = self.contiguous_view(offset, count)
+        if view is not None:
+            self.stats.contiguous += 1
+            return view
+        view = self._chunk_view(offset, count)
+        if view is not None:
+            return view
+        self.stats.stitched += 1
+        return memoryview(self.parent.read_extents(self.extents, byte_offset=offset, byte_count=count))
+
+    def __getitem__(self, key: Union[slice, int]) -> Union[int, memoryview, MemoryWrapper]:
+        length = len(self)
+        if isinstance(key, int):
+            idx = key + length if key < 0 else key
+            if not 0 <= idx < length:
+                raise IndexError(f"Bad index {key} out of {length}")
+            return self.read_view(idx, 1)[0]
+
+        start, stop, step = key.indices(length)
+        assert step == 1, "Can't slice streams with steps"
+        count = max(stop - start, 0)
+
+        view = self.contiguous_view(start, count)
+        if view is not None:
+            self.stats.contiguous += 1
+            return view
+        view = self._chunk_view(start, count)
+        if view is not None:
+            return view
+        self.stats.wrapped += 1
+        return MemoryWrapper(self.parent.map_extents(self.extents, byte_offset=start, byte_count=count), length=count)
+
+    def note_sequential_read(self, offset: int, count: int) -> None:
+        """
+        Scans call this before reading a range of the stream in order, so the parent's `Prefetcher` (if any)
+         can hint the pages coming up next, and its `MemoryBudget` (if any) can release the pages behind.
+        """
+        prefetcher = self.parent.prefetcher
+        if prefetcher is not None:
+            prefetcher.on_sequential_read(self, offset, count)
+        budget = self.parent.budget
+        if budget is not None:
+            budget.on_sequential_read(self, offset, count)
 
 
 class MultiStreamFile(BigHeader):
@@ -97,26 +318,42 @@ class MultiStreamFile(BigHeader):
 
 
 
-    Reading is done through a memory-mapped file by calling `map_pages`.
+    Reading is done through a `PageSource` (by default a memory-mapped file) by calling `map_pages`.
+    A file object gets memory-mapped, `bytes`-like objects are read directly, and any other
+     `PageSource` from `pdbpy.pagesource` can be passed in (pread, callbacks, ...).
     You give it a page-list, an optional byte-offset, and an optional count of bytes to read.
-    A list of memoryviews corresponding to the pages(and their relevant content) are returned,
-     and it's up to the caller to use that properly when doing lookups.
+    A list of memoryviews corresponding to the runs of consecutive pages (and their relevant content)
+     are returned, and it's up to the caller to use that properly when doing lookups.
+    If the page list is already coalesced with `coalesce_pages`, use `map_extents` directly.
 
     If a list of memory views is to bothersome, there is `read_pages` which calls `map_pages`,
      joins the mapped bytes into a single object, and returns it.
 
     Reading should likely be done through a `MultiStreamFileStream`-object instead instead.
     It wraps those page views in a MemoryWrapper object for easy access.
+
+    `enable_prefetch` turns on read-ahead hints for scans over a memory-mapped file, see `Prefetcher`.
+    With a `budget`, caches of the streams are kept under its limit, see `MemoryBudget`.
     """
 
-    def __init__(self, file: IOBase):
+    def __init__(
+        self,
+        file: Union[IOBase, PageSource, bytes, bytearray, memoryview],
+        budget: Optional[MemoryBudget] = None,
+    ):
         self.file = file
-        self.mmap = mmap.mmap(file.fileno(), length=0, access=mmap.ACCESS_READ)
-        self.mem = memoryview(self.mmap)
-
-        self.children: dict[str, MultiStreamFileStream] = dict()
-
-        self.header = BigHeader.from_buffer_copy(self.mem)
+        self.source = make_page_source(file)
+        # Only there for sources that keep everything in memory.
+        self.mmap = getattr(self.source, "mmap", None)
+        self.mem = getattr(self.source, "mem", None)
+        self.prefetcher: Optional[Prefetcher] = None
+        self.budget = budget
+
+        # Streams register themselves here, but it doesn't keep them alive;
+        #  whoever opened a stream (usually a `StreamDirectoryStream`) decides how long it lives.
+        self.children: weakref.WeakValueDictionary[str, MultiStreamFileStream] = weakref.WeakValueDictionary()
+
+        self.header = BigHeader.from_buffer_copy(self.source.read(0, ctypes.sizeof(BigHeader)))
         assert (
             self.header.magic == b"Microsoft C/C++ MSF 7.00\r\n\x1a\x44\x53"
         ), f"Can only deal with 'big' header type and 'MSF 7.0' version, got {self.header.magic}"
@@ -126,6 +363,11 @@ class MultiStreamFile(BigHeader):
         for name, _ in self.header._fields_[1:]:
             setattr(self, name, getattr(self.header, name))
 
+        assert (
+            self.source.page_size in (None, self.page_size)
+        ), f"Source says pages are {self.source.page_size} bytes, but the header says {self.page_size}"
+        self.source.page_size = self.page_size
+
         # The directory may be fragmented into a number of pages scattered throughout the file.
         # How many pages do we need, to make an index of all those pages?
         directory_indices_count = self.pages_to_contain_bytes(self.directory_size_in_bytes)
@@ -141,7 +383,7 @@ class MultiStreamFile(BigHeader):
         SizeOfBigHeader = ctypes.sizeof(BigHeader)
         list_of_pages_that_contain_directory_indices = (
             uint32_t * page_count_to_contain_directory_page_indices
-        ).from_buffer_copy(self.mem, SizeOfBigHeader)[:]
+        ).from_buffer_copy(self.source.read(SizeOfBigHeader, 4 * page_count_to_contain_directory_page_indices))[:]
         # print(f"Page numbers that contain directory indices: {list(list_of_pages_that_contain_directory_indices)}")
 
         # Read all pages with directory indices
@@ -156,7 +398,7 @@ class MultiStreamFile(BigHeader):
         self.pdb_root_stream_pages = list(directory_page_indices)
 
         ############# READING ROOT PDB STREAM (it seeds .children)
-        MultiStreamFileStream(
+        self.directory_stream = MultiStreamFileStream(
             parent=self,
             page_list=self.pdb_root_stream_pages,
             size_bytes=self.directory_size_in_bytes,
@@ -166,6 +408,17 @@ class MultiStreamFile(BigHeader):
     def __repr__(self):
         return str(self.__dict__)
 
+    def enable_prefetch(self, ahead_bytes: int = 1024 * 1024) -> Prefetcher:
+        """
+        Marks the whole file for random access (which is what lookups do) and has scans hint the
+         `ahead_bytes` of their stream in front of them instead. Only does anything for sources that
+         take hints, like the default memory-mapped one.
+        """
+        self.prefetcher = Prefetcher(ahead_bytes=ahead_bytes)
+        if self.mmap is not None:
+            self.source.advise(0, len(self.mmap), "random")
+        return self.prefetcher
+
     def map_pages(
         self,
         page_list: Sequence[int],
@@ -175,45 +428,58 @@ class MultiStreamFile(BigHeader):
         debug: bool = False,
     ) -> Sequence[memoryview]:
         """
-        Returns a list of memory-subviews that represent the area requested.
+        Returns a list of memory-subviews that represent the area requested, one per run of consecutive pages.
         Join yourself or use `read_pages` to get a corresponding contiguous bytes-object.
         """
+        return self.map_extents(coalesce_pages(page_list), byte_offset=byte_offset, byte_count=byte_count)
 
-        page_size = self.page_size
-
-        start_page = byte_offset // page_size
-        byte_offset = byte_offset % page_size
-
-        pages_to_read = page_list[start_page:]
+    def map_extents(
+        self,
+        extents: Sequence[PageExtent],
+        *,
+        byte_offset: int = 0,
+        byte_count: Optional[int] = None,
+    ) -> Sequence[memoryview]:
+        """
+        Like `map_pages`, but takes a list of (first_page, page_count)-runs as made by `coalesce_pages`.
+        """
+        ranges = self.extent_ranges(extents, byte_offset=byte_offset, byte_count=byte_count)
+        if byte_count is not None:
+            bytes_left = byte_count - sum(count for _, count in ranges)
+            assert bytes_left <= 0, f"Tried to read {byte_count} bytes but the pages ran out {bytes_left} bytes short"
+        return [self.source.read(addr, count) for addr, count in ranges]
 
-        # TODO: Massage pages_to_read to be a zip of (page_start, page_size) to merge continuous page numbers
+    def extent_ranges(
+        self,
+        extents: Sequence[PageExtent],
+        *,
+        byte_offset: int = 0,
+        byte_count: Optional[int] = None,
+    ) -> List[Tuple[int, int]]:
+        """
+        Translates a range of a stream made of `extents` into (file_offset, byte_count)-ranges of the file.
+        If the pages run out before `byte_count` bytes, the ranges just end there.
+        """
+        page_size = self.page_size
 
         if byte_count is None:
-            bytes_left = len(pages_to_read) * page_size - byte_offset
-        else:
-            end_page = (byte_offset + byte_count) // page_size
-            if start_page == end_page:
-                start = page_list[start_page] * page_size + byte_offset
-                return (self.mem[start : start + byte_count],)
-            bytes_left = byte_count
-
-        areas: List[memoryview] = []
-        page_list_iter = iter(pages_to_read)
-
-        while bytes_left > 0:
-            # if debug: print()
-            page_num = next(page_list_iter)
-            # if debug: print(f"Page num: {page_num}")
-            addr = page_size * page_num
-            read_amount = min(byte_offset + bytes_left, page_size) - byte_offset
-            # if debug: print(f"Read amount: {read_amount}")
-            # if debug: print(f"Reading from {byte_offset} to {byte_offset + read_amount}")
-            area = self.mem[addr + byte_offset : addr + byte_offset + read_amount]
-            areas.append(area)
+            byte_count = sum(page_count for _, page_count in extents) * page_size - byte_offset
+
+        ranges: List[Tuple[int, int]] = []
+        bytes_left = byte_count
+        for first_page, page_count in extents:
+            if bytes_left <= 0:
+                break
+            run_bytes = page_count * page_size
+            if byte_offset >= run_bytes:
+                byte_offset -= run_bytes
+                continue
+            addr = first_page * page_size + byte_offset
+            read_amount = min(run_bytes - byte_offset, bytes_left)
+            ranges.append((addr, read_amount))
             byte_offset = 0
             bytes_left -= read_amount
-        # if debug: print()
-        return areas
+        return ranges
 
     def read_pages(
         self,
@@ -228,6 +494,19 @@ class MultiStreamFile(BigHeader):
 
         return b"".join(self.map_pages(page_list, byte_offset=byte_offset, byte_count=byte_count))
 
+    def read_extents(
+        self,
+        extents: Sequence[PageExtent],
+        *,
+        byte_offset: int = 0,
+        byte_count: Optional[int] = None,
+    ) -> bytes:
+        """
+        Like `read_pages`, but takes a list of (first_page, page_count)-runs as made by `coalesce_pages`.
+        """
+
+        return b"".join(self.map_extents(extents, byte_offset=byte_offset, byte_count=byte_count))
+
     def pages_to_contain_bytes(self, byte_count: int) -> int:
         """
         How many pages do we need to contain byte_count
@@ -0,0 +1,237 @@
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from io import IOBase
+from typing import Callable, List, Optional, Union
+
+
+class PageSource:
+    """
+    Where the bytes of a `MultiStreamFile` come from.
+
+    A source only has to be able to `read` a range of bytes of the file.
+    `MultiStreamFile` tells the source the page size once it has read the header,
+     which lets page-oriented sources cache whole pages.
+
+    `zero_copy` is True if reads are views into memory that is already there (mmap, bytes),
+     and False if every read has to fetch (and copy) data from somewhere.
+
+    `advise` passes access pattern hints on to the OS, for sources where that means anything.
+    """
+
+    page_size: Optional[int] = None
+    zero_copy: bool = False
+
+    def read(self, offset: int, count: int) -> memoryview:
+        raise NotImplementedError()
+
+    def advise(self, offset: int, count: int, advice: str) -> bool:
+        """
+        Hints how a range of the file is going to be used, `advice` being the name of a `MADV_*`
+         constant without the prefix, like "willneed". Returns whether the hint was given.
+        """
+        return False
+
+
+class MmapPageSource(PageSource):
+    """
+    Memory-maps the whole file. This is the default, and lets the OS do the caching.
+    """
+
+    zero_copy = True
+
+    def __init__(self, file: IOBase):
+        self.file = file
+        self.mmap = mmap.mmap(file.fileno(), length=0, access=mmap.ACCESS_READ)
+        self.mem = memoryview(self.mmap)
+
+    def read(self, offset: int, count: int) -> memoryview:
+        return self.mem[offset : offset + count]
+
+    def advise(self, offset: int, count: int, advice: str) -> bool:
+        madv = getattr(mmap, f"MADV_{advice.upper()}", None)
+        if madv is None or not hasattr(self.mmap, "madvise"):
+            return False  # Not on this platform
+        # madvise wants the start to be aligned to the OS page size
+        start = offset - offset % mmap.PAGESIZE
+        end = min(offset + count, len(self.mmap))
+        if end <= start:
+            return False
+        self.mmap.madvise(madv, start, end - start)
+        return True
+
+
+class BufferPageSource(PageSource):
+    """
+    Reads from a PDB that is already in memory, like a `bytes` blob from an artifact store.
+    """
+
+    zero_copy = True
+
+    def __init__(self, buffer: Union[bytes, bytearray, memoryview]):
+        self.mem = memoryview(buffer)
+
+    def read(self, offset: int, count: int) -> memoryview:
+        return self.mem[offset : offset + count]
+
+
+class CachedPageSource(PageSource):
+    """
+    Base class for sources that have to fetch data, and keep the last `cache_pages` pages they fetched
+     (or every page, if `cache_pages` is None).
+    Subclasses implement `_fetch`; missing pages are fetched one run of consecutive pages at a time.
+    `fetches` and `fetched_bytes` count how much had to be fetched.
+    Reads hold a lock, so the source can be shared with background threads.
+    """
+
+    zero_copy = False
+
+    def __init__(self, page_size: Optional[int] = None, cache_pages: Optional[int] = 256):
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        self.pages: OrderedDict[int, bytes] = OrderedDict()
+        self.fetches = 0
+        self.fetched_bytes = 0
+        self.lock = threading.RLock()
+
+    def _fetch(self, offset: int, count: int) -> bytes:
+        raise NotImplementedError()
+
+    def _fetch_counted(self, offset: int, count: int) -> bytes:
+        data = self._fetch(offset, count)
+        self.fetches += 1
+        self.fetched_bytes += len(data)
+        return data
+
+    def _fetch_pages(self, first_page: int, page_count: int) -> None:
+        page_size = self.page_size
+        data = self._fetch_counted(first_page * page_size, page_count * page_size)
+        for idx in range(page_count):
+            page = data[idx * page_size : (idx + 1) * page_size]
+            if not page:
+                break
+            self.pages[first_page + idx] = page
+
+    def read(self, offset: int, count: int) -> memoryview:
+        with self.lock:
+            return self._read(offset, count)
+
+    def _read(self, offset: int, count: int) -> memoryview:
+        page_size = self.page_size
+        if page_size is None:
+            # Still reading the header, so there's no page size to cache by yet.
+            return memoryview(self._fetch_counted(offset, count))
+
+        first_page = offset // page_size
+        end_page = (offset + count + page_size - 1) // page_size
+
+        # Fetch runs of missing pages in one go.
+        missing_start = None
+        for page in range(first_page, end_page + 1):
+            if page < end_page and page not in self.pages:
+                if missing_start is None:
+                    missing_start = page
+            elif missing_start is not None:
+                self._fetch_pages(missing_start, page - missing_start)
+                missing_start = None
+
+        pages: List[bytes] = []
+        for page in range(first_page, end_page):
+            data = self.pages.get(page, None)
+            assert data is not None, f"Page {page} is past the end of the file"
+            self.pages.move_to_end(page)
+            pages.append(data)
+        while self.cache_pages is not None and len(self.pages) > self.cache_pages:
+            self.pages.popitem(last=False)
+
+        local_offset = offset - first_page * page_size
+        if len(pages) == 1:
+            return memoryview(pages[0])[local_offset : local_offset + count]
+        return memoryview(b"".join(pages))[local_offset : local_offset + count]
+
+
+class PreadPageSource(CachedPageSource):
+    """
+    Reads pages with `os.pread` instead of mapping the file.
+    Useful on network filesystems where page faults are slow, and on hosts short on address space.
+    The file needs to stay open for as long as the source is used.
+    """
+
+    def __init__(self, file: IOBase, cache_pages: int = 256):
+        assert hasattr(os, "pread"), "os.pread isn't available on this platform"
+        super().__init__(cache_pages=cache_pages)
+        self.file = file
+        self.fd = file.fileno()
+
+    def _fetch(self, offset: int, count: int) -> bytes:
+        return os.pread(self.fd, count, offset)
+
+
+class CallbackPageSource(CachedPageSource):
+    """
+    Gets pages from a user callback `fetch(page_no) -> bytes`.
+    If `page_size` isn't given, it's taken from the size of page 0.
+    """
+
+    def __init__(self, fetch: Callable[[int], bytes], page_size: Optional[int] = None, cache_pages: int = 256):
+        super().__init__(cache_pages=cache_pages)
+        self.fetch = fetch
+        if page_size is None:
+            first_page = fetch(0)
+            page_size = len(first_page)
+            self.pages[0] = first_page
+        self.page_size = page_size
+
+    def _fetch(self, offset: int, count: int) -> bytes:
+        page_size = self.page_size
+        first_page = offset // page_size
+        end_page = (offset + count + page_size - 1) // page_size
+        data = b"".join(self.fetch(page) for page in range(first_page, end_page))
+        local_offset = offset - first_page * page_size
+        return data[local_offset : local_offset + count]
+
+
+class RangePageSource(CachedPageSource):
+    """
+    Gets data from a range-read function `read_range(offset, count) -> bytes`, like a HTTP range request
+     against an artifact store, or a reader of a file that is still being downloaded.
+
+    Only the pages that are actually touched get fetched, and every fetched page is kept by default,
+     so looking up a single symbol or type in a huge PDB only pulls a handful of pages.
+    """
+
+    def __init__(
+        self,
+        read_range: Callable[[int, int], bytes],
+        page_size: Optional[int] = None,
+        cache_pages: Optional[int] = None,
+    ):
+        super().__init__(page_size=page_size, cache_pages=cache_pages)
+        self.read_range = read_range
+
+    def _fetch(self, offset: int, count: int) -> bytes:
+        return self.read_range(offset, count)
+
+
+def make_page_source(file: Union[IOBase, PageSource, bytes, bytearray, memoryview]) -> PageSource:
+    """
+    Passes sources through, wraps in-memory buffers in a `BufferPageSource` and memory-maps files.
+    """
+    if isinstance(file, PageSource):
+        return file
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return BufferPageSource(file)
+    return MmapPageSource(file)
+
+
+__all__ = (
+    "PageSource",
+    "MmapPageSource",
+    "BufferPageSource",
+    "CachedPageSource",
+    "PreadPageSource",
+    "CallbackPageSource",
+    "RangePageSource",
+    "make_page_source",
+)
@@ -10,7 +10,8 @@
 #  https://github.com/fungosforks/Windows-NT-4.0-Source/blob/7a9a4aa4c3f950d0cd5512af11224084205e8fc0/private/sdktools/vctools/pdb/mre/mretype.cpp#L37-L94
 
 
-from typing import List, Tuple, Union
+import struct
+from typing import Dict, List, Optional, Tuple, Union
 from dtypes.typedefs import uint8_t, uint16_t, uint32_t, uint64_t
 from dtypes.typedefs import int16_t, int32_t, int64_t
 from dtypes.typedefs import float32_t, float64_t
@@ -18,6 +19,7 @@ from ctypes import sizeof as c_sizeof
 
 
 from pdbpy.codeview import LeafID
+from pdbpy.utils.decoder import get_decoder
 
 LeafNumericToCType = {
     #LeafID.CHAR      : ctypes.c_char,
@@ -33,6 +35,30 @@ LeafNumericToCType = {
     LeafID.REAL80    : uint8_t * 10,
     LeafID.REAL128   : uint8_t * 16,
 }
+# leaf -> (size, decoder) of the numeric leaves, decoded without constructing the ctypes values
+_numeric_leaf_decoders = {
+    leaf: (c_sizeof(typ), get_decoder(typ).unpack_from) for leaf, typ in LeafNumericToCType.items()
+}
+_unpack_u16 = struct.Struct("<H").unpack_from
+# The most bytes a numeric leaf takes up, the leaf included
+NUMERIC_MAX_BYTES = 2 + max(size for size, _ in _numeric_leaf_decoders.values())
+
+
+def buffer_at(mem, offset: int, count: int) -> Tuple[Union[bytes, memoryview], int]:
+    """
+    Returns (buffer, offset) to `struct.unpack_from` the `count` bytes at `offset` of `mem` with.
+
+    Buffers are returned as they are. Anything else (streams, `MemoryWrapper`s) has just those bytes read out,
+     as unpacking straight from a `MemoryWrapper` over more than one piece of memory joins (and keeps) all of it.
+    """
+    if isinstance(mem, (bytes, bytearray, memoryview)):
+        return mem, offset
+    read_view = getattr(mem, "read_view", None)
+    if read_view is not None:
+        return read_view(offset, count), 0
+    return bytes(mem[offset : offset + count]), 0
+
+
 def read_numeric(mem : memoryview, offset : int):
     """
     Reads a number from the memory offset, returns tuple of (post_read_offset, value).
@@ -43,48 +69,127 @@ def read_numeric(mem : memoryview, offset : int):
     Strings and floats>65bits are returned as bytes-objects
     """
 
-    number_or_leaf_id : int = uint16_t.from_buffer_copy(mem[offset : offset + 2]).value
+    if not isinstance(mem, (bytes, bytearray, memoryview)):
+        # Only the bytes the number can take up, see `buffer_at`
+        window, window_offset = buffer_at(mem, offset, min(NUMERIC_MAX_BYTES, len(mem) - offset))
+        post_read_offset, value = read_numeric(window, window_offset)
+        return offset + post_read_offset - window_offset, value
+
+    number_or_leaf_id : int = _unpack_u16(mem, offset)[0]
     data_offset = offset + 2
 
+    if number_or_leaf_id < LeafID.NUMERIC:
+        return data_offset, number_or_leaf_id
+
     match number_or_leaf_id:
-        case int(id) if id < LeafID.NUMERIC:
-            return data_offset, number_or_leaf_id
         case LeafID.VARSTRING:
             print(mem[data_offset : data_offset+10])
             raise RuntimeError("Implement this as needed")
             length = uint16_t.from_buffer_copy(mem[data_offset : data_offset + 2])
             return data_offset + 2 + length, mem[data_offset + 2 : data_offset + 2 + length]
         case _:
-            typ = LeafNumericToCType.get(LeafID(number_or_leaf_id), None)
-            if typ is None:
+            size_and_decode = _numeric_leaf_decoders.get(number_or_leaf_id, None)
+            if size_and_decode is None:
                 raise ValueError(f"Type based in ID {number_or_leaf_id} (leafif: {LeafID(number_or_leaf_id)}) did not match anything in the conversion table")
 
-            size = c_sizeof(typ)
-            value = typ.from_buffer_copy(mem[data_offset : data_offset + size]).value
-            return data_offset + size, value
+            size, decode = size_and_decode
+            return data_offset + size, decode(mem, data_offset)[0]
     
     raise ValueError(f"How did we get here? {offset}, {number_or_leaf_id}, {data_offset}")
 
+class StringInterner:
+    """
+    A table of the strings read so far, so that names that show up over and over (like "__vfptr", or the name
+     of every base class) share one `str` instead of one each.
+    Install one with `set_string_interner`, and drop it (or `clear` it) when the strings aren't needed anymore;
+     unlike `sys.intern`, the strings go away with the table.
+
+    >>> interner = StringInterner()
+    >>> interner("".join(["Su", "per"])) is interner("".join(["Sup", "er"]))
+    True
+    """
+
+    def __init__(self):
+        self.strings: Dict[str, str] = {}
+
+    def __call__(self, string: str) -> str:
+        return self.strings.setdefault(string, string)
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def clear(self) -> None:
+        self.strings.clear()
+
+
+_string_interner: Optional[StringInterner] = None
+
+
+def set_string_interner(interner: Optional[StringInterner]) -> Optional[StringInterner]:
+    """
+    Makes every string read by this module go through `interner` (or nothing, with None).
+    Returns the interner that was set before.
+    """
+    global _string_interner
+    previous = _string_interner
+    _string_interner = interner
+    return previous
+
+
+def decode_string(data: bytes) -> Union[str, bytes]:
+    """
+    UTF8 decodes a name, or returns the bytes as they are if they aren't UTF8.
+    """
+    try:
+        string = data.decode("utf8")
+    except UnicodeDecodeError:
+        return data
+    if _string_interner is not None:
+        return _string_interner(string)
+    return string
+
+
+# How much is copied out at a time when looking for the end of a string, which covers most names in one go.
+STRING_WINDOW = 128
+
+
+def read_terminated(mem, offset: int) -> bytes:
+    r"""
+    Returns the bytes from `offset` up to (not including) the next zero byte.
+
+    The terminator is found in bulk: with `find` if `mem` has it (like `bytes`), and otherwise by copying
+     out a window at a time and searching that. For streams, that means names spanning pages only stitch
+     together the window, not the rest of the stream.
+
+    >>> read_terminated(memoryview(b"\x00abc\x00"), 1)
+    b'abc'
+    """
+    find = getattr(mem, "find", None)
+    if find is not None:
+        terminator = find(b"\x00", offset)
+        assert terminator != -1, f"Unterminated string at {offset}"
+        return bytes(mem[offset:terminator])
+
+    window_size = STRING_WINDOW
+    while True:
+        window = bytes(mem[offset : offset + window_size])
+        terminator = window.find(0)
+        if terminator != -1:
+            return window[:terminator]
+        assert len(window) == window_size, f"Unterminated string at {offset}"
+        window_size *= 4
+
+
 def read_stringz(mem: memoryview) -> Tuple[str, int]:
     """
     Returns a tuple of [string, bytes including zero terminator]
     """
-    stuff : List[int] = []
-    offset = 0
-    while True:
-        byte = mem[offset]
-        offset += 1
-        if byte == 0:
-            joined = bytes(stuff)
-            try:
-                return joined.decode('utf8'), offset
-            except UnicodeDecodeError:
-                return joined, offset
-        stuff.append(byte)
+    data = read_terminated(mem, 0)
+    return decode_string(data), len(data) + 1
 
 def read_pascalstring(mem: memoryview) -> Tuple[str, int]:
     count : int = mem[0]
-    return bytes(mem[1: 1+count]).decode('utf8'), 1+count
+    return decode_string(bytes(mem[1: 1+count])), 1+count
 
 
 def read_string(mem : memoryview, offset : int, leafy : Union[LeafID, int]) -> Tuple[int, str]:
@@ -98,15 +203,185 @@ def read_string(mem : memoryview, offset : int, leafy : Union[LeafID, int]) -> T
 
     """
     if leafy > LeafID.ST_MAX:
-        #print("sZ string")
-        # read until zero-terminator
-
-        # TODO seriously consider rewriting to use file-like interface with seeking and page-caching
-        #  instead of "fully random access through not-quite-memory-like interface"
-        string, bytecount = read_stringz(mem[offset:])
-        return offset + bytecount, string
+        # read until zero-terminator, without slicing off the rest of `mem` first
+        # (for sequential reading of many strings, see `StreamCursor`)
+        data = read_terminated(mem, offset)
+        return offset + len(data) + 1, decode_string(data)
     else:
         # read u8, then that number of bytes
         #print("Pascal string")
-        string, bytecount = read_pascalstring(mem[offset:])
-        return offset + bytecount, string
+        count : int = mem[offset]
+        return offset + 1 + count, decode_string(bytes(mem[offset + 1 : offset + 1 + count]))
+
+
+def skip_string(mem, offset: int, leafy: Union[LeafID, int]) -> int:
+    r"""
+    Like `read_string`, but only returns the offset after the string, without decoding it.
+
+    >>> skip_string(b"\x00\x00abc\x00", 2, LeafID.MEMBER), skip_string(b"\x03abc", 0, LeafID.MEMBER_ST)
+    (6, 4)
+    """
+    if leafy > LeafID.ST_MAX:
+        find = getattr(mem, "find", None)
+        if find is None:
+            return offset + len(read_terminated(mem, offset)) + 1
+        terminator = find(b"\x00", offset)
+        assert terminator != -1, f"Unterminated string at {offset}"
+        return terminator + 1
+    return offset + 1 + mem[offset]
+
+
+DEFAULT_READ_AHEAD = 64 * 1024
+
+_u8 = struct.Struct("<B")
+_u16 = struct.Struct("<H")
+_u32 = struct.Struct("<I")
+
+
+class StreamCursor:
+    """
+    File-like sequential reader over a `MultiStreamFileStream` (or anything else that is sliceable).
+
+    Instead of slicing the underlying stream for every field, the cursor copies a window of
+     `read_ahead` bytes at a time and decodes fields out of that.
+    Positions are absolute offsets into `mem`, and reads past `end` are not allowed.
+    With `sequential`, every refill of the window is reported to `mem.note_sequential_read` if it has one,
+     which lets a `Prefetcher` hint the pages ahead of the scan.
+
+    >>> cursor = StreamCursor(b"\\x01\\x00\\x02\\x00\\x00\\x00hi\\x00\\x03abc")
+    >>> cursor.read_u16(), cursor.read_u32(), cursor.read_stringz(), cursor.read_pascal()
+    (1, 2, 'hi', 'abc')
+    """
+
+    def __init__(
+        self,
+        mem,
+        offset: int = 0,
+        end: Optional[int] = None,
+        read_ahead: int = DEFAULT_READ_AHEAD,
+        sequential: bool = False,
+    ):
+        self.mem = mem
+        self.end = len(mem) if end is None else end
+        self.read_ahead = max(read_ahead, 1)
+        self._note_read = getattr(mem, "note_sequential_read", None) if sequential else None
+
+        self.pos = offset
+        if isinstance(mem, bytes):
+            # Already contiguous memory, no need to window it.
+            self._window = mem
+            self._window_start = 0
+        else:
+            self._window = b""
+            self._window_start = offset
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, pos: int) -> None:
+        assert 0 <= pos <= self.end, f"Can't seek to {pos}, end is at {self.end}"
+        self.pos = pos
+
+    def skip(self, count: int) -> None:
+        self.seek(self.pos + count)
+
+    def align(self, alignment: int, base: int = 0) -> None:
+        """
+        Skips ahead until the position is a multiple of `alignment` bytes from `base`.
+        """
+        self.seek(min(base + (self.pos - base + alignment - 1) // alignment * alignment, self.end))
+
+    def remaining(self) -> int:
+        return self.end - self.pos
+
+    def at_end(self) -> bool:
+        return self.pos >= self.end
+
+    def _fill(self, count: int) -> int:
+        """
+        Makes sure `count` bytes from the current position are in the window,
+         and returns the position relative to the window.
+        """
+        assert self.pos + count <= self.end, f"Can't read {count} bytes at {self.pos}, end is at {self.end}"
+        relative = self.pos - self._window_start
+        if relative >= 0 and relative + count <= len(self._window):
+            return relative
+
+        window_end = min(self.pos + max(count, self.read_ahead), self.end)
+        if self._note_read is not None:
+            self._note_read(self.pos, window_end - self.pos)
+        self._window = bytes(self.mem[self.pos : window_end])
+        self._window_start = self.pos
+        return 0
+
+    def read(self, count: int) -> memoryview:
+        relative = self._fill(count)
+        self.pos += count
+        return memoryview(self._window)[relative : relative + count]
+
+    def peek_u16(self) -> int:
+        relative = self._fill(2)
+        return _u16.unpack_from(self._window, relative)[0]
+
+    def read_u8(self) -> int:
+        relative = self._fill(1)
+        value = _u8.unpack_from(self._window, relative)[0]
+        self.pos += 1
+        return value
+
+    def read_u16(self) -> int:
+        relative = self._fill(2)
+        value = _u16.unpack_from(self._window, relative)[0]
+        self.pos += 2
+        return value
+
+    def read_u32(self) -> int:
+        relative = self._fill(4)
+        value = _u32.unpack_from(self._window, relative)[0]
+        self.pos += 4
+        return value
+
+    def read_numeric(self):
+        """
+        Like `read_numeric`, returns the value and advances past it.
+        """
+        number_or_leaf_id = self.peek_u16()
+        count = 2
+        if number_or_leaf_id >= LeafID.NUMERIC and number_or_leaf_id != LeafID.VARSTRING:
+            typ = LeafNumericToCType.get(number_or_leaf_id, None)
+            if typ is not None:
+                count += c_sizeof(typ)
+        relative = self._fill(count)
+        post_read_offset, value = read_numeric(memoryview(self._window), relative)
+        self.pos += post_read_offset - relative
+        return value
+
+    def read_stringz(self) -> str:
+        """
+        Like `read_stringz`, returns the string (or bytes if it isn't UTF8) and advances past the terminator.
+        """
+        relative = self._fill(1)
+        terminator = self._window.find(0, relative)
+        count = 1
+        while terminator == -1:
+            # The string continues past the window, grab a larger one.
+            count = min(max(2 * count, len(self._window) - relative + 1), self.remaining())
+            relative = self._fill(count)
+            terminator = self._window.find(0, relative)
+            assert terminator != -1 or count < self.remaining(), f"Unterminated string at {self.pos}"
+
+        joined = self._window[relative:terminator]
+        self.pos += terminator - relative + 1
+        return decode_string(joined)
+
+    def read_pascal(self) -> str:
+        count = self.read_u8()
+        return decode_string(bytes(self.read(count)))
+
+    def read_string(self, leafy: Union[LeafID, int]) -> str:
+        """
+        Like `read_string`, picks zero-terminated or pascal strings depending on the leaf type.
+        """
+        if leafy > LeafID.ST_MAX:
+            return self.read_stringz()
+        return self.read_pascal()
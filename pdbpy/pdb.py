@@ -1,32 +1,50 @@
 
 
-from typing import List, Optional
+from typing import List, Optional, Union
 from pdbpy.codeview.records.symbols.base import SymbolBase
 from pdbpy.codeview.records.symbols.datasym import DataSym
 from pdbpy.codeview.symbols import SymEnum
 
+from pdbpy.budget import MemoryBudget
 from pdbpy.msf import MultiStreamFile
+from pdbpy.pagesource import PageSource
 from pdbpy.streams.debuginformationstream.debuginformationstream import PdbDebugInformationStream
 from pdbpy.streams.directorystream.streamdirectory import StreamDirectoryStream
 from pdbpy.streams.pdbinfo import PdbInfoStream
 from pdbpy.streams.sectionheaderstream.sectionheaderstream import PdbSectionHeaderStream
+from pdbpy.streams.stringtable import PdbStringTableStream
 from pdbpy.streams.symbolsstream.symbolsstream import PdbSymbolRecordStream
 from pdbpy.streams.typestream.pdbtypestream import PdbTypeStream
+from pdbpy.streams.typestream.records.pdbtypehashstream import PdbTypeHashStream
 
 
 class PDB:
     msf:            Optional[MultiStreamFile]
     _directory:      Optional[StreamDirectoryStream]
     _info:           Optional[PdbInfoStream]
+    _names:          Optional[PdbStringTableStream]
     _types:          Optional[PdbTypeStream]
     _debuginfo:      Optional[PdbDebugInformationStream]
     _symbols:        Optional[PdbSymbolRecordStream]
     _sectionheaders: Optional[PdbSectionHeaderStream]
 
-    def __init__(self, filepath: Optional[str]):
+    def __init__(
+        self,
+        filepath: Union[str, PageSource, bytes, None],
+        budget: Optional[MemoryBudget] = None,
+        background_type_buckets: bool = False,
+    ):
+        """
+        Pass the same `budget` to several PDBs to keep the memory their caches hold under a shared limit.
+        With `background_type_buckets` the buckets for looking up types by name are built on a background
+         thread as soon as `types` is first used, instead of on the first lookup by name.
+        """
         self.msf = None
+        self.budget = budget
+        self.background_type_buckets = background_type_buckets
         self._directory = None
         self._info = None
+        self._names = None
         self._types = None
         self._debuginfo = None
         self._symbols = None
@@ -34,10 +52,17 @@ class PDB:
         if filepath:
             self.load(filepath)
     
-    def load(self, filepath: str):
+    def load(self, filepath: Union[str, PageSource, bytes]):
+        """
+        Loads a PDB from a path (which gets memory-mapped), from an in-memory blob,
+         or from any `PageSource`.
+        """
         assert self.msf is None
+        if not isinstance(filepath, str):
+            self.msf = MultiStreamFile(filepath, budget=self.budget)
+            return
         with open(filepath, "rb") as f:
-            self.msf = MultiStreamFile(f)
+            self.msf = MultiStreamFile(f, budget=self.budget)
 
     @property
     def directory(self):
@@ -56,12 +81,36 @@ class PDB:
         self._info = PdbInfoStream(info_file)
         return self._info
     
+    @property
+    def names(self):
+        if self._names:
+            return self._names
+        names_stream_number = self.info.get_named_stream_index("/names")
+        assert names_stream_number is not None, "There is no /names stream"
+        self._names = PdbStringTableStream(self.directory.get_stream_by_index(names_stream_number))
+        return self._names
+
     @property
     def types(self):
         if self._types:
             return self._types
         type_info_file = self.directory.get_stream_by_index(2)
-        self._types = PdbTypeStream(type_info_file, self._directory, upfront_memory=False)
+        types = PdbTypeStream(type_info_file, upfront_memory=False)
+        hash_stream_number = int(types.header.hash_stream_number)
+        # Only incrementally linked PDBs need the names, for their hash adjustments.
+        needs_names = bool(types.header.hash_adjustment_buffer.byte_count)
+        if needs_names and self.info.get_named_stream_index("/names") is None:
+            # Without the names the hash stream can't be trusted, name lookups use `build_name_index` instead.
+            hash_stream_number = 0xFFFF
+        if hash_stream_number != 0xFFFF:
+            hash_file = self.directory.get_stream_by_index(hash_stream_number)
+            names = self.names if needs_names else None
+            types.set_hash_stream(
+                PdbTypeHashStream(
+                    hash_file, types.header, background_buckets=self.background_type_buckets, names=names
+                )
+            )
+        self._types = types
         return self._types
     
     @property
@@ -0,0 +1,94 @@
+import mmap
+import weakref
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pdbpy.msf import MultiStreamFileStream
+
+
+def os_pages(byte_count: int) -> int:
+    return (max(byte_count, 0) + mmap.PAGESIZE - 1) // mmap.PAGESIZE
+
+
+class PrefetchStats:
+    """
+    hints: number of MADV_WILLNEED calls made
+    hinted_pages: OS pages covered by those calls
+    avoided_faults: OS pages that were hinted before a scan got to them. Each of those would otherwise
+     have been a synchronous page fault on a cold cache, so it's an estimate of the faults avoided.
+    """
+
+    def __init__(self):
+        self.hints = 0
+        self.hinted_pages = 0
+        self.avoided_faults = 0
+
+    def __repr__(self):
+        return (
+            f"PrefetchStats(hints={self.hints}, hinted_pages={self.hinted_pages}, "
+            f"avoided_faults={self.avoided_faults})"
+        )
+
+
+class _ScanState:
+    def __init__(self):
+        self.hint_start = 0
+        self.hinted_until = 0
+        self.counted_until = 0
+
+
+class Prefetcher:
+    """
+    Opt-in read-ahead for sequential scans over a memory-mapped `MultiStreamFile`,
+     enabled through `MultiStreamFile.enable_prefetch`.
+
+    Streams are scattered over the file, so the kernel's own read-ahead (which goes in file order) mostly
+     guesses wrong. Instead the whole mapping is marked MADV_RANDOM, which is what point lookups want, and
+     scans tell the prefetcher where they are so the next `ahead_bytes` of the stream, following its page
+     list, get MADV_WILLNEED.
+    """
+
+    def __init__(self, ahead_bytes: int = 1024 * 1024):
+        self.ahead_bytes = ahead_bytes
+        self.stats = PrefetchStats()
+        self._scans: weakref.WeakKeyDictionary["MultiStreamFileStream", _ScanState] = weakref.WeakKeyDictionary()
+
+    def on_sequential_read(self, stream: "MultiStreamFileStream", offset: int, count: int) -> None:
+        """
+        Called by scans (see `StreamCursor`) when they are about to read `count` bytes at `offset` of `stream`.
+        """
+        state = self._scans.get(stream, None)
+        if state is None or offset < state.hint_start or offset > state.hinted_until:
+            # New scan, or one that jumped somewhere else.
+            state = _ScanState()
+            state.hint_start = state.hinted_until = state.counted_until = offset
+            self._scans[stream] = state
+
+        read_end = offset + count
+        counted_from = max(offset, state.counted_until)
+        self.stats.avoided_faults += os_pages(min(read_end, state.hinted_until) - counted_from)
+        state.counted_until = max(state.counted_until, read_end)
+
+        # Keep at least half the read-ahead distance hinted in front of the scan.
+        if state.hinted_until >= read_end + self.ahead_bytes // 2:
+            return
+        hint_from = max(state.hinted_until, read_end)
+        hint_to = min(read_end + self.ahead_bytes, len(stream))
+        if hint_to <= hint_from:
+            return
+        # The ranges follow the stream, so the hinted part only grows for as long as the source takes the hints.
+        #  Sources that don't (anything but mmap, or no madvise) never count as hinted.
+        hinted_until = hint_from
+        for addr, length in stream.parent.extent_ranges(
+            stream.extents, byte_offset=hint_from, byte_count=hint_to - hint_from
+        ):
+            if not stream.parent.source.advise(addr, length, "willneed"):
+                break
+            self.stats.hints += 1
+            self.stats.hinted_pages += os_pages(length)
+            hinted_until += length
+        if hinted_until > hint_from:
+            state.hinted_until = hinted_until
+
+
+__all__ = ("Prefetcher", "PrefetchStats")
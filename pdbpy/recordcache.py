@@ -0,0 +1,120 @@
+import sys
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from pdbpy.budget import MemoryBudget
+
+
+class RecordCacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return f"RecordCacheStats(hits={self.hits}, misses={self.misses}, evictions={self.evictions})"
+
+
+def estimate_record_bytes(record: Any) -> int:
+    """
+    Roughly how much memory a parsed record holds: the object, its attributes, and the objects in list
+     attributes (like the members of a `FieldList`). Slotted records count what's in their slots.
+    """
+    byte_count = sys.getsizeof(record)
+    attributes = getattr(record, "__dict__", None)
+    if attributes:
+        byte_count += sys.getsizeof(attributes)
+        values = list(attributes.values())
+    else:
+        slots = getattr(type(record), "__slots__", ())
+        values = [getattr(record, slot) for slot in slots if hasattr(record, slot)]
+    for value in values:
+        if isinstance(value, list):
+            byte_count += sys.getsizeof(value) + sum(estimate_record_bytes(item) for item in value)
+        else:
+            byte_count += sys.getsizeof(value)
+    return byte_count
+
+
+class RecordCache:
+    """
+    A LRU of parsed records, bounded by both a number of entries and an estimate of the bytes they hold.
+    Setting `max_entries` to 0 turns it off.
+
+    The records are shared between everyone who looks them up, so don't modify them.
+
+    The whole cache is charged to the `MemoryBudget` (if any) as one entry, which is refreshed whenever a record
+     is added. If the budget evicts it, the cache is emptied.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        max_bytes: int = 16 * 1024 * 1024,
+        budget: Optional[MemoryBudget] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.budget = budget
+        self.byte_count = 0
+        self.stats = RecordCacheStats()
+        self._records: OrderedDict[Hashable, Tuple[Any, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._records
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._records.get(key, None)
+        if entry is None:
+            self.stats.misses += 1
+            return default
+        self.stats.hits += 1
+        self._records.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, record: Any, byte_count: Optional[int] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        if byte_count is None:
+            byte_count = estimate_record_bytes(record)
+
+        old = self._records.pop(key, None)
+        if old is not None:
+            self.byte_count -= old[1]
+        self._records[key] = (record, byte_count)
+        self.byte_count += byte_count
+
+        # The newest record is always kept, even if it's larger than `max_bytes` on its own.
+        while len(self._records) > 1 and (len(self._records) > self.max_entries or self.byte_count > self.max_bytes):
+            _, (_, evicted_bytes) = self._records.popitem(last=False)
+            self.byte_count -= evicted_bytes
+            self.stats.evictions += 1
+
+        if self.budget is not None:
+            self.budget.charge(self, "records", self.byte_count)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """
+        Drops the record for `key`, or every record if no key is given.
+        """
+        if key is None:
+            self._records.clear()
+            self.byte_count = 0
+        else:
+            old = self._records.pop(key, None)
+            if old is not None:
+                self.byte_count -= old[1]
+        if self.budget is not None:
+            self.budget.charge(self, "records", self.byte_count)
+
+    def budget_evict(self, key) -> None:
+        assert key == "records", f"Don't know how to evict {key}"
+        self.stats.evictions += len(self._records)
+        self._records.clear()
+        self.byte_count = 0
+
+
+__all__ = ("RecordCache", "RecordCacheStats", "estimate_record_bytes")
@@ -4,6 +4,7 @@ from typing import List
 from memorywrapper import make_slices
 
 from pdbpy.msf import MultiStreamFileStream
+from pdbpy.parsing import StreamCursor
 from pdbpy.streams.debuginformationstream.dbidbgheader import DbiDbgHeader
 from pdbpy.streams.debuginformationstream.dbistreamheader import PDBDbiStreamHeader
 from pdbpy.streams.debuginformationstream.moduleinformation import ModuleInformation
@@ -25,6 +26,7 @@ class PdbDebugInformationStream:
         self,
         file: MultiStreamFileStream,
         upfront_memory: bool = False,
+        chunked_memory: bool = False,
         debug: bool = False,
     ):
         self.debug = debug
@@ -34,6 +36,8 @@ class PdbDebugInformationStream:
 
         if upfront_memory:
             self.file = bytes(file)
+        elif chunked_memory:
+            file.enable_chunk_cache()
 
         self.header = PDBDbiStreamHeader.from_buffer_copy(self.file[: c_sizeof(PDBDbiStreamHeader)])
 
@@ -43,13 +47,11 @@ class PdbDebugInformationStream:
         # print(self.header)
 
         # Parse modules (variable sized)
-        dbiex_area = memoryview(
-            bytes(self.file[c_sizeof(self.header) : c_sizeof(self.header) + self.header.module_size])
-        )
-        while len(dbiex_area) != 0:
-            module_info, bytecount = ModuleInformation.from_memory(memoryview(dbiex_area), False)
+        dbiex_start = c_sizeof(self.header)
+        cursor = StreamCursor(self.file, dbiex_start, end=dbiex_start + self.header.module_size)
+        while not cursor.at_end():
+            module_info = ModuleInformation.from_cursor(cursor, False)
             # print(f"0x{len(self.modules):X}: {module_info.module} {module_info.object}")
-            dbiex_area = dbiex_area[bytecount:]
             self.modules.append(module_info)
 
         # Skip section contribution until we figure out why we want that I guess
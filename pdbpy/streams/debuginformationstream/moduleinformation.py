@@ -2,7 +2,7 @@ from typing import Tuple
 from dtypes.structify import Structy, structify
 from dtypes.typedefs import uint16_t, uint32_t
 from ctypes import sizeof as c_sizeof
-from pdbpy.parsing import read_stringz
+from pdbpy.parsing import StreamCursor
 
 from pdbpy.types import ByteCount32, FileCount16, ModuleIndex16, NameIndex32, Offset32, SectionIndex16, StreamNumber16
 
@@ -63,12 +63,23 @@ class ModuleInformation(Structy):
 
     @classmethod
     def from_memory(cls, mem : memoryview, debug : bool) -> Tuple['ModuleInformation', int]:
+        cursor = StreamCursor(mem)
+        self = cls.from_cursor(cursor, debug)
+        return self, cursor.tell()
+
+    @classmethod
+    def from_cursor(cls, cursor : StreamCursor, debug : bool) -> 'ModuleInformation':
+        """
+        Reads a module info entry at the cursor, and leaves the cursor at the start of the next (4-byte aligned) entry.
+        """
         my_size = c_sizeof(cls)
-        self : ModuleInformation = cls.from_buffer_copy(mem)
-        self.module, bytecount_module = read_stringz(mem[my_size:])
-        self.object, bytecount_object = read_stringz(mem[my_size + bytecount_module:])
+        start = cursor.tell()
+        self : ModuleInformation = cls.from_buffer_copy(cursor.read(my_size))
+        self.module = cursor.read_stringz()
+        self.object = cursor.read_stringz()
+        cursor.align(4, base=start)
 
-        return self, ((my_size + bytecount_module + bytecount_object + 3) // 4) * 4
+        return self
 
 
 
@@ -1,45 +1,83 @@
+import weakref
+from array import array
+from typing import MutableMapping
+
 from pdbpy.msf import MultiStreamFileStream
+from pdbpy.utils import arrays
+from pdbpy.utils.arrays import from_numpy_u32, u32_array, u32_prefix_sum
+
+NIL_STREAM_SIZE = 0xFFFFFFFF
 
-from dtypes.typedefs import uint32_t
 
 class StreamDirectoryStream:
-    def __init__(self, file : MultiStreamFileStream):
+    """
+    The directory is a count of streams, followed by the byte size of every stream,
+     followed by the page lists of every stream back to back.
+
+    Only the sizes are decoded upfront, along with a prefix sum of how many pages the streams before
+     a given stream use. A stream's page list is decoded when the stream is asked for.
+
+    Opened streams are cached by index, so `get_stream_by_index` can be called again and again for
+     the same stream. With `weak_stream_cache` the cache only holds weak references, so streams nobody
+     uses anymore can be freed (and are opened anew the next time they are asked for).
+    """
+
+    stream_count: int
+    stream_sizes: "array[int]"
+    page_list_offsets: "array[int]"  # Index of the first page number of every stream, plus the total at the end.
+    page_lists_start: int  # Byte offset into the directory where the page lists start.
+
+    _streams: MutableMapping[int, MultiStreamFileStream]
+
+    def __init__(self, file : MultiStreamFileStream, weak_stream_cache : bool = False):
         self.file = file
+        self._streams = weakref.WeakValueDictionary() if weak_stream_cache else dict()
 
-        stream_count = uint32_t.from_buffer_copy(file[:4]).value
+        stream_count = u32_array(file[:4])[0]
         self.stream_count = stream_count
         #print(f"Streams in PDB: {stream_count}")
 
-        stream_sizes = (uint32_t * stream_count).from_buffer_copy(file[4:4+4*stream_count])
-        #stream_sizes = list(stream_sizes)
-        #print(f"Stream sizes: {[hex(x) for x in stream_sizes]}")
+        self.stream_sizes = u32_array(file[4:4+4*stream_count])
+        #print(f"Stream sizes: {[hex(x) for x in self.stream_sizes]}")
 
-        page_indices_for_streams = []
+        self.page_lists_start = 4+4*stream_count
+        self.page_list_offsets = self._count_pages(file.parent.page_size)
 
-        start = 4+4*stream_count
-        for idx in range(stream_count):
-            size_bytes = stream_sizes[idx]
-            pages_for_stream = file.parent.pages_to_contain_bytes(size_bytes) if size_bytes != 0xFFFFFFFF else 0
-            #print(pages_for_stream)
-            if pages_for_stream == 0:
-                page_indices_for_streams.append(())
-            else:
-                indices = (uint32_t * pages_for_stream).from_buffer_copy(file[start : start + 4*pages_for_stream])[:]
-                start += 4 * len(indices)
-                page_indices_for_streams.append(indices)
-        #print(page_indices_for_streams)
+    def _count_pages(self, page_size: int) -> "array[int]":
+        if arrays.numpy is not None:
+            np = arrays.numpy
+            sizes = np.frombuffer(self.stream_sizes, dtype=np.uint32).astype(np.uint64)
+            page_counts = np.where(sizes == NIL_STREAM_SIZE, np.uint64(0), (sizes + page_size - 1) // page_size)
+            # All uint64, mixing in Python ints would make the sum a float64
+            return from_numpy_u32(np.concatenate((np.zeros(1, np.uint64), np.cumsum(page_counts, dtype=np.uint64))))
 
-        stream_sizes_and_page_lists = list(zip(stream_sizes, page_indices_for_streams))
-        self._stream_sizes_and_page_lists = stream_sizes_and_page_lists
+        return u32_prefix_sum(
+            0 if size_bytes == NIL_STREAM_SIZE else (size_bytes + page_size - 1) // page_size
+            for size_bytes in self.stream_sizes
+        )
 
+    def get_stream_size(self, stream_index : int) -> int:
+        return self.stream_sizes[stream_index]
 
+    def get_page_list(self, stream_index : int) -> "array[int]":
+        first = self.page_list_offsets[stream_index]
+        end = self.page_list_offsets[stream_index + 1]
+        if first == end:
+            return array("I")
+        start = self.page_lists_start
+        return u32_array(self.file[start + 4 * first : start + 4 * end])
 
     def get_stream_by_index(self, stream_index : int):
-        # TODO: Make a small cache of (page_num, read_offset) and make reading of
-        #  streams happen on-demand in relation to that?
         assert stream_index >= 0
         assert stream_index < self.stream_count, f"Tried to open stream {stream_index} out of {self.stream_count} streams"
 
-        byte_count, page_list = self._stream_sizes_and_page_lists[stream_index]
+        stream = self._streams.get(stream_index, None)
+        if stream is not None:
+            return stream
+
+        byte_count = self.get_stream_size(stream_index)
+        page_list = self.get_page_list(stream_index)
 
-        return MultiStreamFileStream(parent=self.file.parent, page_list = page_list, size_bytes = byte_count, streamname=stream_index)
+        stream = MultiStreamFileStream(parent=self.file.parent, page_list = page_list, size_bytes = byte_count, streamname=stream_index)
+        self._streams[stream_index] = stream
+        return stream
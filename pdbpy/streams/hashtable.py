@@ -0,0 +1,41 @@
+from typing import List, Tuple
+
+from pdbpy.parsing import StreamCursor
+
+
+def read_bit_vector(cursor: StreamCursor) -> List[int]:
+    """
+    Reads a serialized bit vector: a word count followed by that many uint32 words.
+    Returns the indices of the set bits, in order.
+    """
+    word_count = cursor.read_u32()
+    set_bits: List[int] = []
+    for word_idx in range(word_count):
+        word = cursor.read_u32()
+        bit = 0
+        while word:
+            if word & 1:
+                set_bits.append(word_idx * 32 + bit)
+            word >>= 1
+            bit += 1
+    return set_bits
+
+
+def read_hash_table(cursor: StreamCursor) -> List[Tuple[int, int]]:
+    """
+    Reads a serialized PDB hash table with uint32 keys and values, as used by the named stream map in
+     the info stream and the hash adjusters of the type streams.
+
+    It's a size and a capacity, a bit vector of the present buckets, a bit vector of the deleted buckets,
+     then a key and a value for each present bucket. Only the (key, value)-pairs are returned.
+
+    >>> read_hash_table(StreamCursor(bytes.fromhex("01000000 02000000 01000000 02000000 00000000 05000000 09000000")))
+    [(5, 9)]
+    """
+    size = cursor.read_u32()
+    capacity = cursor.read_u32()
+    present = read_bit_vector(cursor)
+    read_bit_vector(cursor)  # Deleted buckets, nothing to do with them when reading.
+    assert len(present) == size, f"Hash table says it has {size} entries but {len(present)} buckets are present"
+    assert size <= capacity, f"Hash table has {size} entries but only room for {capacity}"
+    return [(cursor.read_u32(), cursor.read_u32()) for _ in present]
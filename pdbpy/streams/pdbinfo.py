@@ -1,6 +1,10 @@
 import ctypes
+import struct
+from typing import Dict, Optional
 
 from pdbpy.msf import MultiStreamFileStream
+from pdbpy.parsing import StreamCursor
+from pdbpy.streams.hashtable import read_hash_table
 
 from dtypes.structify import (Structy, structify)
 from dtypes.typedefs import (uint8_t, uint16_t, uint32_t)
@@ -28,6 +32,13 @@ class PDBInfoHeader(Structy):
 
 
 class PdbInfoStream:
+    """
+    After the header come the names of the named streams, and a hash table mapping the offset of each name
+     to the index of the stream, which are decoded into `named_streams` when it's first used.
+    """
+
+    _named_streams: Optional[Dict[str, int]]
+
     def __init__(self, file: MultiStreamFileStream):
         self.file = file
         mem = self.file[:]
@@ -38,6 +49,28 @@ class PdbInfoStream:
         
         header_size = ctypes.sizeof(stuff)
         self.names = bytes(mem[header_size : header_size + self.byte_count_for_names])
+        self._map_offset = header_size + self.byte_count_for_names
+        self._named_streams = None
+
+    @property
+    def named_streams(self) -> Dict[str, int]:
+        """
+        Stream index by name. A map that can't be read (truncated, or names that aren't there) counts as
+         no named streams at all, so PDBs with an odd map still open, and just don't find `/names` and such.
+        """
+        if self._named_streams is None:
+            named_streams = {}
+            try:
+                for name_offset, stream_index in read_hash_table(StreamCursor(self.file, self._map_offset)):
+                    name_end = self.names.index(b"\0", name_offset)
+                    named_streams[self.names[name_offset:name_end].decode("utf8")] = stream_index
+            except (AssertionError, ValueError, IndexError, struct.error):
+                named_streams = {}
+            self._named_streams = named_streams
+        return self._named_streams
+
+    def get_named_stream_index(self, name: str) -> Optional[int]:
+        return self.named_streams.get(name, None)
 
     def __repr__(self):
         return str(self.__dict__)
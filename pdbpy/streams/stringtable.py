@@ -0,0 +1,50 @@
+from ctypes import sizeof as c_sizeof
+
+from dtypes.structify import Structy, structify
+from dtypes.typedefs import uint32_t
+
+from pdbpy.msf import MultiStreamFileStream
+from pdbpy.parsing import StreamCursor
+
+STRING_TABLE_SIGNATURE = 0xEFFEEFFE
+
+
+@structify
+class StringTableHeader(Structy):
+    signature: uint32_t
+    hash_version: uint32_t
+    byte_count: uint32_t
+
+
+class PdbStringTableStream:
+    """
+    The "/names" stream, found through the named stream map of the info stream.
+    Other streams refer to strings in it by their offset into the string buffer ("name index").
+    The hash buckets after the strings are for lookups the other way, and aren't read.
+    """
+
+    file: MultiStreamFileStream | bytes
+    header: StringTableHeader
+
+    def __init__(
+        self,
+        file: MultiStreamFileStream,
+        upfront_memory: bool = False,
+        debug: bool = False,
+    ):
+        self.file = file
+        self.debug = debug
+        if upfront_memory:
+            self.file = bytes(file)
+
+        self.header = StringTableHeader.from_buffer_copy(self.file[: c_sizeof(StringTableHeader)])
+        assert (
+            self.header.signature == STRING_TABLE_SIGNATURE
+        ), f"Not a string table, signature is {self.header.signature:X}"
+        self.strings_start = c_sizeof(StringTableHeader)
+        self.strings_end = self.strings_start + int(self.header.byte_count)
+
+    def get_string(self, name_index: int) -> str:
+        assert 0 <= name_index < self.header.byte_count, f"Name index {name_index} is past the strings"
+        cursor = StreamCursor(self.file, self.strings_start + name_index, end=self.strings_end, read_ahead=256)
+        return cursor.read_stringz()
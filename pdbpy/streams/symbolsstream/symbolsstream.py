@@ -4,6 +4,8 @@ from typing import Generator, List, Optional
 from pdbpy.codeview.records.symbols.base import SymbolBase, associate_symbols
 from pdbpy.codeview.symbols import SymEnum
 from pdbpy.msf import MultiStreamFileStream
+from pdbpy.parsing import StreamCursor
+from pdbpy.streams.typestream.records.slotted import slotted_variant
 from dtypes.structify import Structy, structify
 from dtypes.typedefs import uint16_t, uint32_t
 from ctypes import sizeof as c_sizeof
@@ -22,39 +24,49 @@ assert c_sizeof(SymbolInformation) == 4+4+2
 
 class PdbSymbolRecordStream:
 
-    def __init__(self, file: MultiStreamFileStream, upfront_memory : bool = False, debug : bool=False):
+    def __init__(
+        self,
+        file: MultiStreamFileStream,
+        upfront_memory : bool = False,
+        chunked_memory : bool = False,
+        debug : bool=False,
+    ):
         self.debug = debug
         self.file = file
 
         if upfront_memory:
             self.file = bytes(file)
+        elif chunked_memory:
+            file.enable_chunk_cache()
         
-    def symbols(self, types: Optional[List[SymEnum]] = None) -> Generator[SymbolBase, None, None]:
-        memory = self.file[:]
-        while len(memory):
-
-            base = SymbolBase.from_buffer_copy(memory[0:4])
-            record_length = base.record_length
+    def symbols(self, types: Optional[List[SymEnum]] = None, slotted: bool = True) -> Generator[SymbolBase, None, None]:
+        """
+        Yields the symbols of the supported kinds, or only those of `types`.
+        They're slotted by default (see `slotted_variant`), so a scan doesn't make a ctypes structure per symbol.
+        """
+        cursor = StreamCursor(self.file, sequential=True)
+        while not cursor.at_end():
+            record_start = cursor.tell()
+            record_length = cursor.read_u16()
 
             assert record_length >= 2
-            assert record_length <= len(memory)-2, f"Record says it wants to read {record_length} out of {len(memory)-2} available bytes"
-            record_data = memory[:record_length+2]
-
-            memory = memory[record_length+2:]
+            assert record_length <= cursor.remaining(), f"Record says it wants to read {record_length} out of {cursor.remaining()} available bytes"
 
-            typ = base.record_type
+            typ = SymEnum(cursor.peek_u16())
             #if typ in (SymEnum.S_ALIGN, SymEnum.S_SKIP):
             #    continue
-            if types is not None:
-                if typ not in types:
-                    continue
-
-            klass = associate_symbols.registry.get(typ, None)
+            klass = None
+            if types is None or typ in types:
+                klass = associate_symbols.registry.get(typ, None)
             if klass is None:
                 #print(f"Found no class for {typ.name}")
+                cursor.seek(record_start + record_length + 2)
                 continue
-            symbol = klass.from_memory(memoryview(record_data), record_length, base.record_type)
-            yield symbol
-
-
 
+            if slotted:
+                klass = slotted_variant(klass)
+            cursor.seek(record_start)
+            # Copied out of the read-ahead window so the symbol doesn't keep the whole window alive.
+            record_data = bytes(cursor.read(record_length + 2))
+            symbol = klass.from_memory(memoryview(record_data), record_length, typ)
+            yield symbol
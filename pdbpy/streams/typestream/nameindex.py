@@ -0,0 +1,31 @@
+from array import array
+
+from pdbpy.codeview.types import type_index
+from pdbpy.utils.arrays import u32_group_by
+from pdbpy.utils.hash import get_hash_for_string
+
+
+class TypeNameIndex:
+    """
+    A name -> TI index that pdbpy builds itself (see `PdbTypeStream.build_name_index`), for type streams
+     without a usable hash stream.
+    It hashes names just like the hash stream does, and answers the same question:
+     which TIs _might_ be called `string`.
+    """
+
+    def __init__(self, tis: "array[int]", hashes: "array[int]"):
+        self.tis = tis
+        self.buckets = max(len(tis), 1)
+        self.order, self.starts = u32_group_by(array("I", (h % self.buckets for h in hashes)), self.buckets)
+
+    @property
+    def byte_count(self) -> int:
+        return sum(values.itemsize * len(values) for values in (self.tis, self.order, self.starts))
+
+    def get_possible_ti_for_string_by_hash(self, string: str) -> list[type_index]:
+        bucket = get_hash_for_string(string) % self.buckets
+        tis = self.tis
+        return [tis[idx] for idx in self.order[self.starts[bucket] : self.starts[bucket + 1]]]
+
+
+__all__ = ("TypeNameIndex",)
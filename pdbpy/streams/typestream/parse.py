@@ -1,10 +1,35 @@
-from typing import Optional, Tuple
-
-from dtypes.typedefs import uint16_t
+import logging
+import struct
+from collections import Counter
+from typing import Dict, Optional, Tuple
 
 from pdbpy.codeview import LeafID
+from pdbpy.parsing import buffer_at
 
 from .records.base import PackedStructy, extract_padding, get_record_type_by_leaf_type
+from .records.opaque import OpaqueRecord
+from .records.slotted import slotted_variant
+
+logger = logging.getLogger(__name__)
+
+_unpack_u16 = struct.Struct("<H").unpack_from
+
+# How many records of every unsupported leaf kind `parse_record` has skipped.
+unsupported_leaves: Counter = Counter()
+# The count at which each unsupported leaf kind gets logged next.
+_next_log_counts: Dict[int, int] = {}
+
+
+def _note_unsupported_leaf(record_type: int) -> None:
+    # Logged the 1st, 10th, 100th... time, so scans over lots of them don't spend their time logging.
+    count = unsupported_leaves[record_type] = unsupported_leaves[record_type] + 1
+    if count >= _next_log_counts.get(record_type, 1):
+        _next_log_counts[record_type] = count * 10
+        try:
+            name = LeafID(record_type).name
+        except ValueError:
+            name = f"0x{record_type:X}"
+        logger.info("Can't deal with %s yet, skipped %d of them so far", name, count)
 
 
 def parse_record(
@@ -13,22 +38,41 @@ def parse_record(
     record_type: Optional[int] = None,
     record_size_bytes: Optional[int] = None,
     padding_cricital: bool = False,
+    lazy: bool = False,
+    slotted: bool = False,
+    ti: Optional[int] = None,
     debug: bool = False,
 ) -> Tuple[int, PackedStructy]:
     """
     Returns a tuple of (the first byte after the end of the record) and (the record object)
+
+    Records of leaf kinds that aren't supported come back as an `OpaqueRecord` (with `ti`, if given), skipped
+     using the record size. If the size isn't known either (members of field lists), the first byte after the
+     record isn't known, and is returned as None. The skipped leaf kinds are counted in `unsupported_leaves`.
+
+    With `lazy`, records that have a lazy variant (see `LazyTail`) only decode their fixed part upfront,
+     and names and such when they're first accessed.
+    With `slotted`, records are plain objects with `__slots__` instead of ctypes structures (see `slotted_variant`),
+     lazy ones too.
     """
     if record_type is None:
-        record_type = uint16_t.from_buffer_copy(mem[record_content_offset : record_content_offset + 2]).value
+        record_type = _unpack_u16(*buffer_at(mem, record_content_offset, 2))[0]
 
     if debug:
         print(f"Record type: {record_type} | 0x{record_type:X}")
 
     typ = get_record_type_by_leaf_type(record_type)
     if typ is None:
-        if debug or True:
-            print(f"Can't deal with {LeafID(record_type).name} yet")
-        return None, None
+        _note_unsupported_leaf(record_type)
+        opaque = OpaqueRecord(ti, record_type, record_content_offset, record_size_bytes)
+        if record_size_bytes is None:
+            return None, opaque
+        return record_content_offset + record_size_bytes, opaque
+
+    if lazy:
+        typ = getattr(typ, "lazy_variant", typ)
+    if slotted:
+        typ = slotted_variant(typ)
 
     post_read_offset, parsed = typ.from_memory(mem, record_content_offset, record_size=record_size_bytes, debug=debug)
     if debug:
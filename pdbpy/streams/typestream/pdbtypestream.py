@@ -1,15 +1,48 @@
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
 from ctypes import sizeof as c_sizeof
-from typing import Iterable, List, Tuple
+from typing import Iterable, Optional, Tuple
 
+from pdbpy.codeview import LeafID
 from pdbpy.codeview.types import dynamic_type_index, type_index
 from pdbpy.msf import MultiStreamFileStream
+from pdbpy.parsing import DEFAULT_READ_AHEAD, StreamCursor
+from pdbpy.recordcache import RecordCache
 from pdbpy.streams.typestream.records.baseclass import BaseClass
 from pdbpy.streams.typestream.records.pdbtypehashstream import PdbTypeHashStream
 from pdbpy.streams.typestream.typestreamheader import PDBTypeStreamHeader
+from pdbpy.utils.hash import get_hash_for_string
 
+from .nameindex import TypeNameIndex
 from .parse import parse_record
-from .records.base import PackedStructy
+from .records.base import PackedStructy, TypeProperties
 from .records.codeviewrecordheader import CodeViewRecordHeader
+from .records.enum import Enum
+from .records.structlike import TypeStructLike, structy_types
+
+_record_header = struct.Struct("<HH")
+_MISSING = object()
+# The lookup arrays are charged to the budget in steps of this many entries, not for every entry added.
+_LOOKUP_CHARGE_ENTRIES = 1024
+
+# record type -> (bytes before the size or name, whether a size comes before the name)
+_named_record_layouts = {
+    **{record_type: (c_sizeof(TypeStructLike), True) for record_type in structy_types},
+    LeafID.ENUM: (c_sizeof(Enum), False),
+    LeafID.ENUM_ST: (c_sizeof(Enum), False),
+}
+_enum_types = (LeafID.ENUM, LeafID.ENUM_ST)
+
+
+def _property_mask(name: str) -> int:
+    properties = TypeProperties()
+    setattr(properties, name, 1)
+    return int.from_bytes(bytes(properties), "little")
+
+
+_IS_FORWARD_DEFINITION = _property_mask("is_forward_definition")
+_HAS_UNIQUE_NAME = _property_mask("has_unique_name")
 
 
 class PdbTypeStream:
@@ -21,30 +54,59 @@ class PdbTypeStream:
     header: PDBTypeStreamHeader
     num_types: int
 
-    # These two are intended to be populated as types are iterated and found,
-    #  like a dynamic version of the second part of the hash stream.
-    # Not fully implemented yet.
-    lookup: List[int]
+    # A dynamic version of the second part of the hash stream, populated as types are iterated.
+    # Sorted (dynamic type index, stream offset) pairs, one every `lookup_skip` types that have been walked past.
+    lookup_indices: array
+    lookup_offsets: array
     lookup_skip: int
 
+    # Stream offset of every record, indexed by dynamic type index, see `build_offset_index`.
+    offset_index: Optional[array]
+    # Name lookups for when there is no hash stream, see `build_name_index`.
+    name_index: Optional[TypeNameIndex]
+    # Sorted forward declaration TIs and the TIs of their definitions, see `build_forward_index`.
+    forward_index: Optional[Tuple[array, array]]
+    # Parsed records, see `get_by_type_index`.
+    record_cache: RecordCache
+
     def __init__(
         self,
         file: MultiStreamFileStream,
         lookup_skip: int = 10,
         upfront_memory: bool = False,
+        chunked_memory: bool = False,
+        record_cache_entries: int = 0,
+        record_cache_bytes: int = 16 * 1024 * 1024,
+        slotted_records: bool = False,
         debug: bool = False,
     ):
         """
         lookup_skip sets the "skip" value when adding offsets to the speedreader-cache;
          Every `lookup_skip` pairs of (type_index, stream_offset) is added to a cache.
+         Lookups start from the closest cached offset, so repeated lookups get faster as more of the stream
+         has been walked. Smaller values cost more memory but shorten the walks, see `set_lookup_skip`.
+
+        upfront_memory copies the whole stream into memory at once.
+        chunked_memory instead lets the stream stitch and cache chunks of itself as they are touched,
+         see `MultiStreamFileStream.enable_chunk_cache`.
+
+        record_cache_entries and record_cache_bytes bound the cache of parsed records that `get_by_type_index`
+         keeps, see `RecordCache`. It's off (0 entries) by default. With it on, everyone who looks up a type
+         gets the very same record object, so records must be treated as read-only.
+
+        slotted_records makes `get_by_type_index` return plain objects with `__slots__` instead of ctypes
+         structures, which take less than half the memory and are quicker to make, see `slotted_variant`.
         """
         self.file = file
+        self.slotted_records = slotted_records
         self.debug = debug
 
         self.hash_stream = None
 
         if upfront_memory:
             self.file = bytes(file)
+        elif chunked_memory:
+            file.enable_chunk_cache()
 
         header = PDBTypeStreamHeader.from_buffer_copy(self.file[: c_sizeof(PDBTypeStreamHeader)])
 
@@ -52,7 +114,15 @@ class PdbTypeStream:
         self.num_types = header.ti_max - header.ti_min  # type: ignore
 
         self.lookup_skip = lookup_skip
-        self.lookup = []
+        self.lookup_indices = array("I", [0])
+        self.lookup_offsets = array("I", [c_sizeof(PDBTypeStreamHeader)])
+        self._lookup_charged_entries = 0
+        self.offset_index = None
+        self.name_index = None
+        self.forward_index = None
+        self.record_cache = RecordCache(
+            max_entries=record_cache_entries, max_bytes=record_cache_bytes, budget=getattr(file, "budget", None)
+        )
 
         assert (
             header.hash_key_size_bytes == 4
@@ -61,9 +131,6 @@ class PdbTypeStream:
             self.num_types,
             0,
         ), "yeet"
-        assert header.hash_adjustment_buffer.byte_count == 0, "cant deal with this yet"
-
-        header.index_offset_buffer.byte_count
 
         # hash_stream = stream_directory.get_stream_by_index(self.header.hash_stream_number)
         # PdbTypeHashStream(
@@ -77,56 +144,254 @@ class PdbTypeStream:
     def set_hash_stream(self, stream: PdbTypeHashStream) -> None:
         self.hash_stream = stream
 
+    @property
+    def name_lookup(self) -> PdbTypeHashStream | TypeNameIndex:
+        """
+        What name lookups go through: the hash stream if there is a usable one,
+         otherwise the index from `build_name_index` (which is built if needed).
+        """
+        hash_stream = self.hash_stream
+        if hash_stream is not None and hash_stream.num_types == self.num_types:
+            return hash_stream
+        name_index = self.name_index
+        if name_index is None:
+            name_index = self.build_name_index()
+        else:
+            budget = getattr(self.file, "budget", None)
+            if budget is not None:
+                budget.touch(self, "name_index")
+        return name_index
+
+    def iter_named_records(self) -> Iterable[Tuple[type_index, int, int, str, Optional[str]]]:
+        """
+        Walks the stream once and yields (ti, record_type, properties, name, unique_name) for the named types
+         (structs, classes, enums...), reading just their headers and names.
+        `properties` is the raw value of their `TypeProperties`, and `unique_name` is None if there is none.
+        """
+        cursor = StreamCursor(self.file, c_sizeof(PDBTypeStreamHeader), sequential=True)
+        pos = cursor.tell()
+        for ti in range(self.header.ti_min, self.header.ti_max):
+            size_bytes = cursor.read_u16()
+            record_type = cursor.peek_u16()
+            name_layout = _named_record_layouts.get(record_type, None)
+            if name_layout is not None:
+                fixed_size, has_size = name_layout
+                # Both kinds start with the record type, a count and the properties.
+                cursor.skip(4)
+                properties = cursor.read_u16()
+                cursor.skip(fixed_size - 6)
+                if has_size:
+                    cursor.read_numeric()
+                name = cursor.read_string(record_type)
+                unique_name = cursor.read_string(record_type) if properties & _HAS_UNIQUE_NAME else None
+                yield ti, record_type, properties, name, unique_name
+            # size_bytes counts the record type but not itself
+            pos += 2 + size_bytes
+            cursor.seek(pos)
+
+    def build_forward_index(self) -> Tuple[array, array]:
+        """
+        Walks the stream once and pairs every forward declared struct, class or enum with its definition,
+         matching them by unique name where they have one and by name otherwise.
+        Returns (and keeps) two parallel arrays: the forward declaration TIs, sorted, and their definition TIs.
+        """
+        definitions: dict[Tuple[bool, str], type_index] = {}
+        forwards: list[Tuple[type_index, Tuple[bool, str]]] = []
+        for ti, record_type, properties, name, unique_name in self.iter_named_records():
+            key = (record_type in _enum_types, unique_name if unique_name is not None else name)
+            if properties & _IS_FORWARD_DEFINITION:
+                forwards.append((ti, key))
+            else:
+                definitions.setdefault(key, ti)
+
+        forward_tis = array("I")
+        definition_tis = array("I")
+        for ti, key in forwards:
+            definition_ti = definitions.get(key, None)
+            if definition_ti is not None:
+                forward_tis.append(ti)
+                definition_tis.append(definition_ti)
+
+        self.forward_index = forward_index = (forward_tis, definition_tis)
+        budget = getattr(self.file, "budget", None)
+        if budget is not None:
+            budget.charge(self, "forward_index", forward_tis.itemsize * 2 * len(forward_tis))
+        return forward_index
+
+    def resolve_forward(self, ti: type_index) -> type_index:
+        """
+        Returns the TI of the definition if `ti` is a forward declaration of a struct, class or enum,
+         otherwise (or if there is no definition in the PDB) `ti` itself.
+        The first call builds the index with `build_forward_index`.
+        """
+        forward_index = self.forward_index
+        if forward_index is None:
+            forward_index = self.build_forward_index()
+        else:
+            budget = getattr(self.file, "budget", None)
+            if budget is not None:
+                budget.touch(self, "forward_index")
+        forward_tis, definition_tis = forward_index
+        idx = bisect_left(forward_tis, ti)
+        if idx < len(forward_tis) and forward_tis[idx] == ti:
+            return definition_tis[idx]
+        return ti
+
+    def build_name_index(self) -> TypeNameIndex:
+        """
+        Walks the stream once, reading just the headers and names of the named types (structs, classes,
+         enums...), and indexes the names by hash. Used for name lookups if there is no usable hash stream,
+         like in stripped PDBs or ones written by other tools.
+        """
+        tis = array("I")
+        hashes = array("I")
+        for ti, _, _, name, _ in self.iter_named_records():
+            if isinstance(name, str):
+                tis.append(ti)
+                hashes.append(get_hash_for_string(name))
+
+        self.name_index = name_index = TypeNameIndex(tis, hashes)
+        budget = getattr(self.file, "budget", None)
+        if budget is not None:
+            budget.charge(self, "name_index", name_index.byte_count)
+        return name_index
+
     def get_ti_and_record_for_name(self, /, name: str) -> Iterable[Tuple[type_index, PackedStructy]]:
         """
         Iterates the list of potential TIs in the same bucket as the name.
         If records are found matching the given name, the TI and record are yielded
         """
-        assert self.hash_stream
-
-        potential_ti = self.hash_stream.get_possible_ti_for_string_by_hash(name)
+        potential_ti = self.name_lookup.get_possible_ti_for_string_by_hash(name)
         for ti in potential_ti:
             record = self.get_by_type_index(ti)
             if getattr(record, "name", None) == name:
                 yield (ti, record)
 
     def get_structy_by_name(self, /, name: str, skip_forward: bool = True) -> Tuple[type_index, BaseClass]:
-        assert self.hash_stream
-
-        potential_ti = self.hash_stream.get_possible_ti_for_string_by_hash(name)
+        potential_ti = self.name_lookup.get_possible_ti_for_string_by_hash(name)
         for ti in potential_ti:
             record = self.get_by_type_index(ti)
             if record is None or record.record_type not in structy_types:
                 continue
+            if skip_forward and record.properties.is_forward_definition:
+                continue
             if name == getattr(record, "name", None):
                 return ti, record
         assert False, f"yolo? couldn't find {name} 🤔"
 
-        assert name is not None or unique_name is not None, "Need at least a name of any kind!!"
-        for stream_offset, info in self.iter_ti_headers():
-            if info.record_type in structy_types:
-                _, typ = parse_record(
-                    self.file, stream_offset + 2, record_type=info.record_type, record_size_bytes=info.size_bytes
-                )
-                if name is not None and name != typ.name:
-                    continue
-                if unique_name is not None and unique_name != typ.unique_name:
-                    continue
-
-                if skip_forward and typ.properties.is_forward_definition:
-                    continue
-                # print("gottem")
-                return info.ti, typ
-
-    def get_by_type_index(self, ti: type_index):
+    def get_by_type_index(self, ti: type_index, lazy: bool = False):
+        """
+        With `lazy`, names and such are decoded the first time they're used (see `LazyTail`).
+        Records are slotted if the stream was made with `slotted_records`.
+
+        If the record cache is on (see `record_cache_entries`), records are cached by (ti, lazy), and shared
+         between callers: don't modify them. Lazy records also decode in place, without a lock.
+        """
+        key = (ti, lazy)
+        typ = self.record_cache.get(key, _MISSING)
+        if typ is not _MISSING:
+            return typ
         stream_offset, info = self.get_ti_info(ti)
         _, typ = parse_record(
-            self.file, stream_offset + 2, record_type=info.record_type, record_size_bytes=info.size_bytes
+            self.file,
+            stream_offset + 2,
+            record_type=info.record_type,
+            record_size_bytes=info.size_bytes,
+            lazy=lazy,
+            slotted=self.slotted_records,
+            ti=ti,
         )
+        self.record_cache.put(key, typ)
         return typ
 
+    def iter_records(
+        self, record_types: Optional[Iterable[int]] = None, lazy: bool = True, slotted: bool = True
+    ) -> Iterable[Tuple[type_index, PackedStructy]]:
+        """
+        Walks the stream once and yields (ti, record) for every record, or only for those of `record_types`.
+        Records of other types are skipped by their size without being parsed, and the ones that are parsed
+         are lazy by default, so filtering on the fixed part of a record (like `properties.is_forward_definition`)
+         never decodes names that aren't used. The records don't go in the record cache.
+        They're slotted by default too (see `slotted_variant`), so a scan doesn't make a ctypes structure per record.
+        """
+        wanted = None if record_types is None else frozenset(int(record_type) for record_type in record_types)
+        for stream_offset, info in self.iter_ti_headers():
+            if wanted is not None and info.record_type not in wanted:
+                continue
+            _, record = parse_record(
+                self.file,
+                stream_offset + 2,
+                record_type=info.record_type,
+                record_size_bytes=info.size_bytes,
+                lazy=lazy,
+                slotted=slotted,
+                ti=info.ti,
+            )
+            yield info.ti, record
+
     def get_ti_info(self, TI: type_index):
-        return next(self.iter_ti_headers(start_ti=TI))
+        offset_index = self.offset_index
+        if offset_index is not None:
+            assert self.header.ti_min <= TI < self.header.ti_max, f"{TI} isn't in the type stream"
+            pos = offset_index[TI - self.header.ti_min]
+            info = CodeViewRecordHeader(*_record_header.unpack(bytes(self.file[pos : pos + 4])))
+            info.ti = TI
+            return pos, info
+        # Point lookups only walk a short distance from the closest known offset, so don't read ahead much.
+        return next(self.iter_ti_headers(start_ti=TI, read_ahead=4096))
+
+    def build_offset_index(self, window_size: int = 16 * DEFAULT_READ_AHEAD) -> array:
+        """
+        Walks the whole stream once and records the offset of every record, after which
+         `get_ti_info` (and so `get_by_type_index`) is a single array lookup instead of a walk from the
+         closest offset in the hash stream.
+
+        Each offset depends on the size of the record before it, so this can't be vectorized as such;
+         instead the stream is copied `window_size` bytes at a time and the sizes are unpacked straight
+         out of the copies. The index is 4 bytes per type and is charged to the `MemoryBudget` if there is one.
+        """
+        pos = c_sizeof(PDBTypeStreamHeader)
+        end = pos + int(self.header.records_byte_count)
+        note_read = getattr(self.file, "note_sequential_read", None)
+        unpack_size = struct.Struct("<H").unpack_from
+
+        offsets = array("I")
+        window = b""
+        window_start = pos
+        for _ in range(self.num_types):
+            relative = pos - window_start
+            if relative + 2 > len(window):
+                window_end = min(pos + window_size, end)
+                if note_read is not None:
+                    note_read(pos, window_end - pos)
+                window = bytes(self.file[pos:window_end])
+                window_start = pos
+                relative = 0
+            offsets.append(pos)
+            # The size counts the record type but not itself
+            pos += 2 + unpack_size(window, relative)[0]
+        assert pos == end, f"The records ended at {pos}, but the header says they end at {end}"
+
+        self.offset_index = offsets
+        budget = getattr(self.file, "budget", None)
+        if budget is not None:
+            budget.charge(self, "offset_index", offsets.itemsize * len(offsets))
+        return offsets
+
+    def budget_evict(self, key) -> None:
+        # Lookups go back to walking from the closest known offsets until the indices are built again.
+        if key == "offset_index":
+            self.offset_index = None
+        elif key == "name_index":
+            self.name_index = None
+        elif key == "forward_index":
+            self.forward_index = None
+        elif key == "lookup":
+            self.lookup_indices = self.lookup_indices[:1]
+            self.lookup_offsets = self.lookup_offsets[:1]
+            self._lookup_charged_entries = 0
+        else:
+            assert False, f"Don't know how to evict {key}"
 
     def dynamic_to_absolute(self, dynamic_index: dynamic_type_index) -> type_index:
         return dynamic_index + self.header.ti_min  # type: ignore
@@ -134,16 +399,57 @@ class PdbTypeStream:
     def absolute_to_dynamic(self, absolute_index: type_index) -> dynamic_type_index:
         return absolute_index - self.header.ti_min  # type: ignore
 
+    def set_lookup_skip(self, lookup_skip: int) -> None:
+        """
+        Changes how often offsets are cached from now on. Offsets that are already cached are kept.
+        """
+        assert lookup_skip > 0, "Need to skip at least 1"
+        self.lookup_skip = lookup_skip
+
+    def add_lookup(self, dynamic_index: dynamic_type_index, offset: int) -> None:
+        """
+        Caches the stream offset of a type for later lookups to start from.
+        Walking past the end of what's known appends, only offsets from before it need to be inserted.
+        """
+        lookup_indices = self.lookup_indices
+        if dynamic_index > lookup_indices[-1]:
+            lookup_indices.append(dynamic_index)
+            self.lookup_offsets.append(offset)
+        else:
+            idx = bisect_left(lookup_indices, dynamic_index)
+            if lookup_indices[idx] == dynamic_index:
+                return
+            lookup_indices.insert(idx, dynamic_index)
+            self.lookup_offsets.insert(idx, offset)
+
+        if len(lookup_indices) > self._lookup_charged_entries:
+            self._lookup_charged_entries = len(lookup_indices) + _LOOKUP_CHARGE_ENTRIES
+            budget = getattr(self.file, "budget", None)
+            if budget is not None:
+                budget.charge(self, "lookup", lookup_indices.itemsize * 2 * self._lookup_charged_entries)
+
     def get_closest_start_pos_for_ti(self, ti: type_index) -> tuple[dynamic_type_index, int]:
-        assert self.hash_stream
+        """
+        Returns the (dynamic type index, stream offset) of the closest known record at or before `ti`.
 
-        ti, offset = self.hash_stream.get_closest_start_pos_for_ti(ti)
+        Offsets cached while walking the stream are used when they are close enough to not have to walk
+         more than `lookup_skip` records, otherwise the hash stream offsets (if any) are checked too.
+        """
         dynamic_index = self.absolute_to_dynamic(ti)
-        return dynamic_index, offset + c_sizeof(PDBTypeStreamHeader)
-
-    def iter_ti_headers(self, start_ti: type_index = None) -> tuple[int, CodeViewRecordHeader]:
-        type_size = c_sizeof(CodeViewRecordHeader)
-        extra_bytes_to_advance = CodeViewRecordHeader.size_bytes.size
+        idx = bisect_right(self.lookup_indices, dynamic_index) - 1
+        best_index, best_offset = self.lookup_indices[idx], self.lookup_offsets[idx]
+        if dynamic_index - best_index < self.lookup_skip or self.hash_stream is None:
+            return best_index, best_offset
+
+        hash_ti, hash_offset = self.hash_stream.get_closest_start_pos_for_ti(ti)
+        hash_index = self.absolute_to_dynamic(hash_ti)
+        if hash_index > best_index:
+            return hash_index, hash_offset + c_sizeof(PDBTypeStreamHeader)
+        return best_index, best_offset
+
+    def iter_ti_headers(
+        self, start_ti: type_index = None, read_ahead: int = DEFAULT_READ_AHEAD
+    ) -> tuple[int, CodeViewRecordHeader]:
         if start_ti is None:
             start_index = 0
             yield_start_index = 0
@@ -154,17 +460,21 @@ class PdbTypeStream:
             yield_start_index = start_ti - self.header.ti_min
             start_index, pos = self.get_closest_start_pos_for_ti(start_ti)
 
+        # Read-ahead stops at the end of the records, so it doesn't pull in the pages of whatever follows them.
+        records_end = c_sizeof(PDBTypeStreamHeader) + int(self.header.records_byte_count)
+        cursor = StreamCursor(self.file, pos, end=records_end, read_ahead=read_ahead, sequential=start_ti is None)
         for idx in range(start_index, self.num_types):
             if idx % self.lookup_skip == 0:
-                lookup_idx = idx // self.lookup_skip
-                lookup = self.lookup
-                if len(lookup) <= lookup_idx:
-                    self.lookup.append(pos)
-            _, info = CodeViewRecordHeader.from_memory(self.file, pos, type_size, debug=self.debug)
-            info.ti = idx + self.header.ti_min
+                self.add_lookup(idx, pos)
+            size_bytes = cursor.read_u16()
+            record_type = cursor.peek_u16()
             if idx >= yield_start_index:
+                info = CodeViewRecordHeader(size_bytes, record_type)
+                info.ti = idx + self.header.ti_min
                 yield pos, info
-            pos += extra_bytes_to_advance + info.size_bytes
+            # size_bytes counts the record type but not itself
+            pos += 2 + size_bytes
+            cursor.seek(pos)
 
     # def __repr__(self):
     #    return str(self.__dict__)
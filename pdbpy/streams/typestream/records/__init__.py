@@ -2,10 +2,10 @@
 from .array import Array
 from .baseclass import BaseClass
 from .bitfield import Bitfield
-from .enum import Enum
+from .enum import Enum, LazyEnum
 from .enumerate import Enumerate
-from .fieldlist import FieldList
-from .member import Member
+from .fieldlist import FieldList, FieldListMembers, LazyFieldList
+from .member import LazyMember, Member
 from .memberfunction import MemberFunction
 from .method import Method
 from .modifier import Modifier
@@ -13,21 +13,27 @@ from .nesttype import NestType
 from .onemethod import OneMethod
 from .pointer import Pointer
 from .procedure import Procedure
-from .structlike import TypeStructLike
+from .structlike import LazyTypeStructLike, TypeStructLike
 from .vfunctab import VFuncTab
 from .virtualbaseclass import VirtualBaseClass
 
 from .codeviewrecordheader import CodeViewRecordHeader
-from .base import PackedStructy, get_record_type_by_leaf_type
+from .base import LazyTail, PackedStructy, get_record_type_by_leaf_type, header_size
+from .opaque import OpaqueRecord
+from .slotted import SlottedRecord, slotted_variant
 
 __all__ = [
     "Array",
     "BaseClass",
     "Bitfield",
     "Enum",
+    "LazyEnum",
     "Enumerate",
     "FieldList",
+    "LazyFieldList",
+    "FieldListMembers",
     "Member",
+    "LazyMember",
     "MemberFunction",
     "Method",
     "Modifier",
@@ -36,10 +42,16 @@ __all__ = [
     "Pointer",
     "Procedure",
     "TypeStructLike",
+    "LazyTypeStructLike",
     "VFuncTab",
     "VirtualBaseClass",
 
     "CodeViewRecordHeader",
+    "LazyTail",
     "PackedStructy",
     "get_record_type_by_leaf_type",
+    "header_size",
+    "OpaqueRecord",
+    "SlottedRecord",
+    "slotted_variant",
 ]
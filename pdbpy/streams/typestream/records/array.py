@@ -1,12 +1,10 @@
-from ctypes import sizeof as c_sizeof
-
 from dtypes.structify import structify
 from dtypes.typedefs import uint16_t
 from pdbpy.codeview.types import type_index
 
 from pdbpy.parsing import read_numeric, read_string
 
-from .base import record, PackedStructy
+from .base import record, PackedStructy, header_size
 from pdbpy.codeview import LeafID
 
 @record(LeafID.ARRAY)
@@ -18,11 +16,12 @@ class Array(PackedStructy):
     # array_size_bytes
     # name
 
+    extra_attributes = ("array_size_bytes", "name")
 
     @classmethod
     def from_memory(cls, mem: memoryview, offset: int, record_size : int, debug : bool):
 
-        my_size = c_sizeof(cls)
+        my_size = header_size(cls)
         self = cls.from_buffer_copy(mem[offset:offset + my_size])
         self.addr = offset
         post_read_offset = offset + my_size
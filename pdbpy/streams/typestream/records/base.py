@@ -6,7 +6,8 @@ from dtypes.structify import Structy, structify
 from dtypes.typedefs import uint8_t, uint16_t, uint32_t
 
 from pdbpy.codeview import LeafID
-from pdbpy.utils.ctypes import Flaggy
+from pdbpy.parsing import read_numeric
+from pdbpy.utils.ctypes import Flaggy, header_size
 
 
 def sz_bytes_to_string(data: bytes):
@@ -28,6 +29,19 @@ def extract_padding(mem: memoryview, offset: int, required: bool):
 class PackedStructy(Structy):
     _pack_ = 1
 
+    # The Python attributes (besides `addr`) that `from_memory` sets, which slotted variants need slots for.
+    extra_attributes: tuple = ()
+    # Whether the record ends with a name, see `skip_to_name`.
+    named = False
+
+    @classmethod
+    def skip_to_name(cls, mem, offset: int) -> int:
+        """
+        Returns the offset of the name of the record at `offset`, or of its end if it's not `named`,
+         without parsing it. Lets `LazyFieldList` index its members, which don't know their sizes.
+        """
+        return offset + header_size(cls)
+
 
 records_by_id: Dict[LeafID, type[PackedStructy]] = {}
 
@@ -46,6 +60,57 @@ def get_record_type_by_leaf_type(record_type: LeafID) -> Optional[type[PackedStr
     return records_by_id.get(record_type, None)
 
 
+def lazy_record(eager: type[PackedStructy]):
+    """
+    Registers the decorated class as the lazy variant of the record class `eager`, which `parse_record(lazy=True)`
+     uses instead of it.
+    """
+
+    def the_lazy_one(typ: type[PackedStructy]):
+        eager.lazy_variant = typ  # type: ignore
+        return typ
+
+    return the_lazy_one
+
+
+class LazyTail:
+    """
+    Mixin for lazy variants of records.
+
+    Only the fixed (ctypes) part of the record is copied when parsing, and the memory and offset of the rest is kept.
+    The attributes in `lazy_attributes` are then decoded by `read_tail(mem, offset)` the first time one of them is
+     accessed. Records that don't know their size (members of field lists) are parsed eagerly, unless the
+     record overrides `from_memory` to find its end some other way.
+    """
+
+    lazy_attributes: tuple = ()
+
+    @classmethod
+    def from_memory(cls, mem: memoryview, offset: int, record_size: Optional[int], debug: bool):
+        if record_size is None:
+            return super().from_memory(mem, offset, record_size, debug)  # type: ignore
+        my_size = header_size(cls)
+        self = cls.from_buffer_copy(mem[offset : offset + my_size])  # type: ignore
+        self.addr = offset
+        # The tail is copied out (which is cheap next to decoding it), so the record doesn't pin a mapped file.
+        self.defer_tail(bytes(mem[offset + my_size : offset + record_size]), 0)
+        return offset + record_size, self
+
+    def defer_tail(self, mem, offset: int) -> None:
+        self._tail = (mem, offset)
+
+    def __getattr__(self, name: str):
+        # Only called for attributes that aren't set, like the lazy ones before the tail is read.
+        # `_tail` is a slot in the slotted variants, so it's not looked up in `__dict__`.
+        if name in self.lazy_attributes:
+            tail = getattr(self, "_tail", None)
+            if tail is not None:
+                del self._tail
+                self.read_tail(*tail)  # type: ignore
+                return getattr(self, name)
+        raise AttributeError(f"{type(self).__name__} has no attribute {name}")
+
+
 class AccessEnum(IntEnum):
     Private = (1,)
     Protected = (2,)
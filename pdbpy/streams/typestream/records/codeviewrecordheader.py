@@ -1,9 +1,7 @@
-from ctypes import sizeof as c_sizeof
-
 from dtypes.structify import structify
 from dtypes.typedefs import uint16_t
 
-from .base import PackedStructy
+from .base import PackedStructy, header_size
 
 @structify
 # https://github.com/microsoft/microsoft-pdb/blob/1d60e041600117a5004de84baa960d2c953a6aa6/include/cvinfo.h#L1175
@@ -17,7 +15,7 @@ class CodeViewRecordHeader(PackedStructy):
 
     @classmethod
     def from_memory(cls, mem: memoryview, offset: int, record_size: int, debug : bool):
-        my_size = c_sizeof(cls)
+        my_size = header_size(cls)
         post_read_offset = offset + my_size
         self = CodeViewRecordHeader.from_buffer_copy(mem[offset: offset + my_size])
 
@@ -1,12 +1,10 @@
-from ctypes import sizeof as c_sizeof
-
 from dtypes.structify import structify
 from dtypes.typedefs import uint16_t
 from pdbpy.codeview.types import type_index
 
 from pdbpy.parsing import read_string
 
-from .base import record, PackedStructy, TypeProperties
+from .base import LazyTail, lazy_record, record, PackedStructy, TypeProperties, header_size
 from pdbpy.codeview import LeafID
 
 @record(LeafID.ENUM, LeafID.ENUM_ST)
@@ -21,19 +19,32 @@ class Enum(PackedStructy):
     # name
     # unique_name
 
+    extra_attributes = ("name", "unique_name")
+
     @classmethod
     def from_memory(cls, mem: memoryview, offset: int, record_size: int, debug : bool):
-        my_size = c_sizeof(cls)
+        my_size = header_size(cls)
         self = cls.from_buffer_copy(mem[offset: offset + my_size])
         self.addr = offset
-        post_read_offset = offset + my_size
 
-        post_read_offset, self.name = read_string(mem, post_read_offset, self.record_type)
+        return self.read_tail(mem, offset + my_size), self
+
+    def read_tail(self, mem: memoryview, offset: int) -> int:
+        post_read_offset, self.name = read_string(mem, offset, self.record_type)
         if self.properties.has_unique_name:
             post_read_offset, self.unique_name = read_string(mem, post_read_offset, self.record_type)
-
-        return post_read_offset, self
+        return post_read_offset
 
 assert Enum.underlying_type.offset == 6
 
-__all__ = ('Enum',)
\ No newline at end of file
+
+@lazy_record(Enum)
+class LazyEnum(LazyTail, Enum):
+    """
+    `Enum` that decodes the names when they're first used.
+    """
+
+    lazy_attributes = ("name", "unique_name")
+
+
+__all__ = ('Enum', 'LazyEnum')
\ No newline at end of file
@@ -1,11 +1,9 @@
-from ctypes import sizeof as c_sizeof
-
 from dtypes.structify import structify
 from dtypes.typedefs import uint16_t
 
 from pdbpy.parsing import read_numeric, read_string
 
-from .base import record, PackedStructy, FieldAttributes
+from .base import record, PackedStructy, FieldAttributes, header_size
 from pdbpy.codeview import LeafID
 
 
@@ -17,9 +15,16 @@ class Enumerate(PackedStructy):
     #value           : uint16_t # should be ReadNumeric?
     # name
 
+    extra_attributes = ("value", "name")
+    named = True
+
+    @classmethod
+    def skip_to_name(cls, mem, offset: int) -> int:
+        return read_numeric(mem, offset + header_size(cls))[0]
+
     @classmethod
     def from_memory(cls, mem: memoryview, offset: int, record_size: int, debug : bool):
-        my_size = c_sizeof(cls)
+        my_size = header_size(cls)
         self = cls.from_buffer_copy(mem[offset: offset + my_size])
         self.addr = offset
         post_read_offset = offset + my_size
@@ -1,46 +1,255 @@
-from ctypes import sizeof as c_sizeof
+import struct
+from array import array
+from collections.abc import Sequence
+from typing import Dict, List, Optional
 
 from dtypes.structify import structify
 from dtypes.typedefs import uint16_t
 
-from .base import record, PackedStructy, extract_padding
+from .base import (
+    lazy_record,
+    record,
+    PackedStructy,
+    extract_padding,
+    get_record_type_by_leaf_type,
+    header_size,
+)
 from pdbpy.codeview import LeafID
+from pdbpy.parsing import StreamCursor, decode_string, read_string, skip_string
 
 from ..parse import parse_record
 
+_unpack_u16 = struct.Struct("<H").unpack_from
+_ST_MAX = int(LeafID.ST_MAX)
+
 @record(LeafID.FIELDLIST)
 @structify
 class FieldList(PackedStructy):
     record_type     : uint16_t
     # members : List[PackedStructy]
 
+    # Whether the members are parsed with `parse_record(lazy=True)`, see `LazyFieldList`.
+    lazy_members = False
+    # Members are plain objects with `__slots__` (see `slotted_variant`), not a ctypes structure each,
+    #  as the list is what's handed out. `isinstance(member, Member)` and such still work.
+    slotted_members = True
+
+    extra_attributes = ("members",)
+
     @classmethod
     def from_memory(cls, mem: memoryview, offset: int, record_size : int, debug : bool):
 
         assert isinstance(record_size, int), "Parsing a field list requires knowledge of how large the total record is!"
 
-        my_size = c_sizeof(cls)
-        self = cls.from_buffer_copy(mem[offset: offset + my_size])
-        self.addr = offset
-        post_read_offset = offset + my_size
+        my_size = header_size(cls)
+
+        # One bulk read of the whole list, members are then parsed out of contiguous memory.
+        cursor = StreamCursor(mem, offset, end=offset + record_size, read_ahead=record_size)
+        record = cursor.read(record_size)
+        if cls.lazy_members:
+            # Lazy members keep the memory around, and can find the ends of their names in bytes without decoding them.
+            record = record.tobytes()
 
-        post_record = offset + record_size
+        self = cls.from_buffer_copy(record[:my_size])
+        self.addr = offset
+        post_read_offset = my_size
 
         self.members = []
 
-        while post_read_offset < post_record:
+        while post_read_offset < record_size:
 
-            post_read_offset, member = parse_record(mem, post_read_offset, padding_cricital=True, debug=debug)
+            post_read_offset, member = parse_record(
+                record,
+                post_read_offset,
+                padding_cricital=True,
+                lazy=cls.lazy_members,
+                slotted=cls.slotted_members,
+                debug=debug,
+            )
+            if post_read_offset is None:
+                # Unsupported members don't know their size, so the rest of the list can't be parsed. Keep it opaque.
+                member.size_bytes = record_size - member.addr
+                post_read_offset = record_size
+            member.addr += offset
             self.members.append(member)
             #print(f"Member is {member}")
-            #print(f"{post_read_offset} - {post_record}")
+            #print(f"{post_read_offset} - {record_size}")
 
             # paddy padd!
-            if post_read_offset < post_record:
-                paddy = extract_padding(mem, post_read_offset, required=False)
+            if post_read_offset < record_size:
+                paddy = extract_padding(record, post_read_offset, required=False)
                 if debug:
                     print(f"Padding {post_read_offset} with {paddy}")
                 post_read_offset += paddy
 
 
-        return post_read_offset, self
+        return offset + post_read_offset, self
+
+    def find_member(self, name: str) -> Optional[PackedStructy]:
+        """
+        Returns the first member called `name`, or None.
+        """
+        for member in self.members:
+            if getattr(member, "name", None) == name:
+                return member
+        return None
+
+
+class FieldListMembers(Sequence):
+    """
+    The members of a `LazyFieldList`, decoded when they're accessed.
+
+    Making one only walks the list to find where every member starts, and keeps the offsets and leaf kinds
+     (and where the names are) in arrays. Members are then parsed the first time they're indexed, and kept.
+    `index_of` and `find` look members up by name, through a dict of the names that's made the first time.
+
+    `record` is the memory of the whole field list, and `addr` where it is in the stream, to make the
+     `addr` of the members match the eager ones.
+    `lazy` and `slotted` are passed on to `parse_record` for every member, like `FieldList` does.
+    """
+
+    def __init__(self, record: bytes, addr: int, first_offset: int, lazy: bool = True, slotted: bool = False):
+        self.record = record
+        self.addr = addr
+        self.lazy = lazy
+        self.slotted = slotted
+
+        record_size = len(record)
+        # Offset of every member and of the end of the list, the leaf kind of every member,
+        #  and the offset of its name (0 for members without one)
+        offsets = array("I")
+        leaves = array("H")
+        name_offsets = array("I")
+
+        # This loop is all the upfront work, so the hot bits are bound locally.
+        add_offset, add_leaf, add_name_offset, find = offsets.append, leaves.append, name_offsets.append, record.find
+        post_read_offset = first_offset
+        while post_read_offset < record_size:
+            leaf = _unpack_u16(record, post_read_offset)[0]
+            add_offset(post_read_offset)
+            add_leaf(leaf)
+            typ = get_record_type_by_leaf_type(leaf)
+            if typ is None:
+                # Unsupported members don't know their size, so the rest of the list is one opaque member.
+                add_name_offset(0)
+                post_read_offset = record_size
+                break
+
+            name_offset = typ.skip_to_name(record, post_read_offset)
+            if not typ.named:
+                add_name_offset(0)
+                post_read_offset = name_offset
+            elif leaf > _ST_MAX:
+                add_name_offset(name_offset)
+                post_read_offset = find(b"\x00", name_offset) + 1
+                assert post_read_offset, f"Unterminated name at {name_offset}"
+            else:
+                add_name_offset(name_offset)
+                post_read_offset = skip_string(record, name_offset, leaf)
+
+            # Pad bytes are 0xF1-0xFF, with the count in the low bits
+            if post_read_offset < record_size and record[post_read_offset] > 0xF0:
+                post_read_offset += record[post_read_offset] & 0xF
+        offsets.append(post_read_offset)
+
+        self.offsets = offsets
+        self.leaves = leaves
+        self.name_offsets = name_offsets
+        self._members: List[Optional[PackedStructy]] = [None] * len(leaves)
+        self._names: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[idx] for idx in range(*idx.indices(len(self)))]
+        member = self._members[idx]
+        if member is None:
+            member = self._members[idx] = self._parse(idx % len(self))
+        return member
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def _parse(self, idx: int) -> PackedStructy:
+        start = self.offsets[idx]
+        post_read_offset, member = parse_record(
+            self.record, start, padding_cricital=True, lazy=self.lazy, slotted=self.slotted
+        )
+        if post_read_offset is None:
+            member.size_bytes = self.offsets[idx + 1] - start
+        member.addr += self.addr
+        return member
+
+    def index_of(self, name: str) -> Optional[int]:
+        """
+        Returns the index of the first member called `name`, or None.
+        """
+        names = self._names
+        if names is None:
+            names = self._names = {}
+            record = self.record
+            find = record.find
+            for idx, (name_offset, leaf) in enumerate(zip(self.name_offsets, self.leaves)):
+                if not name_offset:
+                    continue
+                if leaf > _ST_MAX:
+                    member_name = decode_string(record[name_offset : find(b"\x00", name_offset)])
+                else:
+                    member_name = read_string(record, name_offset, leaf)[1]
+                names.setdefault(member_name, idx)
+        return names.get(name, None)
+
+    def find(self, name: str) -> Optional[PackedStructy]:
+        """
+        Returns the first member called `name`, or None. Only that member is parsed.
+        """
+        idx = self.index_of(name)
+        return None if idx is None else self[idx]
+
+    def __sizeof__(self) -> int:
+        # Members that have been parsed are not counted
+        return (
+            object.__sizeof__(self)
+            + sum(part.__sizeof__() for part in (self.record, self.offsets, self.leaves, self.name_offsets))
+            + self._members.__sizeof__()
+        )
+
+    def __repr__(self):
+        parsed = sum(member is not None for member in self._members)
+        return f"FieldListMembers({len(self)} members, {parsed} parsed)"
+
+
+@lazy_record(FieldList)
+class LazyFieldList(FieldList):
+    """
+    `FieldList` whose members are a `FieldListMembers`, which only finds where the members are upfront.
+    They're parsed when they're accessed, and are lazy too (for the members that have a lazy variant).
+
+    Looking up a single member by name (`find_member`) parses just that member, which makes it cheap
+     even on classes with thousands of members.
+    """
+
+    lazy_members = True
+
+    @classmethod
+    def from_memory(cls, mem: memoryview, offset: int, record_size: int, debug: bool):
+        assert isinstance(record_size, int), "Parsing a field list requires knowledge of how large the total record is!"
+
+        my_size = header_size(cls)
+        cursor = StreamCursor(mem, offset, end=offset + record_size, read_ahead=record_size)
+        # Copied, as the members are parsed later, and so the record doesn't pin a mapped file.
+        record = cursor.read(record_size).tobytes()
+
+        self = cls.from_buffer_copy(record[:my_size])
+        self.addr = offset
+        self.members = FieldListMembers(record, offset, my_size, lazy=cls.lazy_members, slotted=cls.slotted_members)
+        return offset + self.members.offsets[-1], self
+
+    def find_member(self, name: str) -> Optional[PackedStructy]:
+        return self.members.find(name)
+
+
+__all__ = ("FieldList", "LazyFieldList", "FieldListMembers")
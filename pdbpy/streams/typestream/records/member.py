@@ -1,15 +1,17 @@
-from ctypes import sizeof as c_sizeof
+import struct
 from typing import Optional
 
 from dtypes.structify import structify
 from dtypes.typedefs import uint16_t
 from pdbpy.codeview.types import type_index
 
-from pdbpy.parsing import read_numeric, read_string
+from pdbpy.parsing import read_numeric, read_string, skip_string
 
-from .base import record, PackedStructy, FieldAttributes
+from .base import LazyTail, lazy_record, record, PackedStructy, FieldAttributes, header_size
 from pdbpy.codeview import LeafID
 
+_unpack_u16 = struct.Struct("<H").unpack_from
+
 @record(LeafID.MEMBER, LeafID.MEMBER_ST, LeafID.STMEMBER, LeafID.STMEMBER_ST)
 @structify
 class Member(PackedStructy):
@@ -20,9 +22,19 @@ class Member(PackedStructy):
     #offset
     #name
 
+    extra_attributes = ("static", "offset", "name")
+    named = True
+
+    @classmethod
+    def skip_to_name(cls, mem, offset: int) -> int:
+        post_read_offset = offset + header_size(cls)
+        if _unpack_u16(mem, offset)[0] in (LeafID.STMEMBER, LeafID.STMEMBER_ST):
+            return post_read_offset
+        return read_numeric(mem, post_read_offset)[0]
+
     @classmethod
     def from_memory(cls, mem: memoryview, offset: int, record_size: Optional[int], debug : bool):
-        my_size = c_sizeof(cls)
+        my_size = header_size(cls)
         self = cls.from_buffer_copy(mem[offset: offset + my_size])
         self.addr = offset
 
@@ -31,8 +43,37 @@ class Member(PackedStructy):
 
         if not self.static:
             post_read_offset, self.offset = read_numeric(mem, post_read_offset)
-        post_read_offset, self.name = read_string(mem, post_read_offset, self.record_type)
 
-        return post_read_offset, self
+        return self.read_tail(mem, post_read_offset), self
+
+    def read_tail(self, mem: memoryview, offset: int) -> int:
+        post_read_offset, self.name = read_string(mem, offset, self.record_type)
+        return post_read_offset
+
+
+@lazy_record(Member)
+class LazyMember(LazyTail, Member):
+    """
+    `Member` that decodes its name when it's first used.
+    Members don't know their size, so the end of the name is still found when parsing, just not decoded.
+    """
+
+    lazy_attributes = ("name",)
+
+    @classmethod
+    def from_memory(cls, mem: memoryview, offset: int, record_size: Optional[int], debug : bool):
+        my_size = header_size(cls)
+        self = cls.from_buffer_copy(mem[offset: offset + my_size])
+        self.addr = offset
+
+        post_read_offset = offset + my_size
+        self.static = self.record_type in (LeafID.STMEMBER, LeafID.STMEMBER_ST)
+
+        if not self.static:
+            post_read_offset, self.offset = read_numeric(mem, post_read_offset)
+
+        self.defer_tail(mem, post_read_offset)
+        return skip_string(mem, post_read_offset, self.record_type), self
+
 
-__all__ = ('Member',)
\ No newline at end of file
+__all__ = ('Member', 'LazyMember')
\ No newline at end of file
@@ -1,4 +1,3 @@
-from ctypes import sizeof as c_sizeof
 from typing import Optional
 
 from dtypes.structify import structify
@@ -6,7 +5,7 @@ from dtypes.typedefs import uint16_t
 
 from pdbpy.codeview.types import type_index
 
-from .base import record, PackedStructy
+from .base import record, PackedStructy, header_size
 from pdbpy.codeview import LeafID
 
 @record(LeafID.MODIFIER)
@@ -18,7 +17,7 @@ class Modifier(PackedStructy):
 
     @classmethod
     def from_memory(cls, mem : memoryview, offset : int, record_size : Optional[int], debug : bool):
-        my_size = c_sizeof(cls)
+        my_size = header_size(cls)
         self = cls.from_buffer_copy(mem[offset: offset + my_size])
         self.addr = offset
         post_read_offset = offset + my_size
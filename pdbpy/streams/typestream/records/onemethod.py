@@ -1,14 +1,18 @@
-from ctypes import sizeof as c_sizeof
+import struct
 from typing import Optional
 
 from dtypes.structify import structify
 from dtypes.typedefs import uint16_t
 
 from pdbpy.codeview.types import type_index
+from pdbpy.parsing import buffer_at, read_string
 
-from .base import record, PackedStructy, FieldAttributes
+from .base import record, PackedStructy, FieldAttributes, MethodPropertiesEnum, header_size
 from pdbpy.codeview import LeafID
 
+_unpack_u16 = struct.Struct("<H").unpack_from
+_unpack_u32 = struct.Struct("<I").unpack_from
+
 @record(LeafID.ONEMETHOD)
 @structify
 class OneMethod(PackedStructy):
@@ -21,16 +25,27 @@ class OneMethod(PackedStructy):
     # vtable_offset
     # name
 
+    extra_attributes = ("vtable_offset", "name")
+    named = True
+
+    @classmethod
+    def skip_to_name(cls, mem, offset: int) -> int:
+        my_size = header_size(cls)
+        # The `_mprop` bits of the attributes, without making a `FieldAttributes`
+        mprop = (_unpack_u16(mem, offset + 2)[0] >> 2) & 0x7
+        if mprop in (MethodPropertiesEnum.intro, MethodPropertiesEnum.pureintro):
+            return offset + my_size + 4
+        return offset + my_size
 
     @classmethod
     def from_memory(cls, mem : memoryview, offset : int, record_size : Optional[int], debug : bool):
-        my_size = c_sizeof(cls)
+        my_size = header_size(cls)
         self = cls.from_buffer_copy(mem[offset: offset + my_size])
         self.addr = offset
     
         post_read_offset = offset + my_size
         if self.attributes.mprop in (MethodPropertiesEnum.intro, MethodPropertiesEnum.pureintro):
-            self.vtable_offset = uint32_t.from_buffer_copy(mem[post_read_offset: post_read_offset+4])
+            self.vtable_offset, = _unpack_u32(*buffer_at(mem, post_read_offset, 4))
             post_read_offset += 4
         post_read_offset, self.name = read_string(mem, post_read_offset, self.record_type)
 
@@ -0,0 +1,36 @@
+from typing import Optional, Union
+
+from pdbpy.codeview import LeafID
+
+
+class OpaqueRecord:
+    """
+    Stands in for a record of a leaf kind that isn't supported (yet).
+    Nothing of it is parsed, it's skipped using its size, but it remembers where it is so it can be read by hand.
+
+    `addr` is the offset of the record content (starting with the leaf), and `size_bytes` the size of it.
+    `ti` is None when the record isn't a type of its own, like a member of a field list.
+    """
+
+    __slots__ = ("ti", "record_type", "addr", "size_bytes")
+
+    def __init__(self, ti: Optional[int], record_type: int, addr: int, size_bytes: Optional[int]):
+        self.ti = ti
+        self.record_type = record_type
+        self.addr = addr
+        self.size_bytes = size_bytes
+
+    @property
+    def leaf(self) -> Union[LeafID, int]:
+        try:
+            return LeafID(self.record_type)
+        except ValueError:
+            return self.record_type
+
+    def __repr__(self):
+        leaf = self.leaf
+        name = leaf.name if isinstance(leaf, LeafID) else f"0x{leaf:X}"
+        return f"OpaqueRecord(ti={self.ti}, leaf={name}, addr={self.addr}, size_bytes={self.size_bytes})"
+
+
+__all__ = ("OpaqueRecord",)
@@ -1,15 +1,22 @@
 import struct
-from collections import defaultdict
+import threading
+from array import array
+from bisect import bisect_right
 from ctypes import sizeof as c_sizeof
-from typing import TypeAlias
+from typing import Tuple, TypeAlias
 
 from dtypes.structify import Structy, structify
 from dtypes.typedefs import uint32_t
 from memorywrapper import MemoryWrapper
 
-from pdbpy.codeview.types import dynamic_type_index, type_index
+from pdbpy.budget import MemoryBudget
+from pdbpy.codeview.types import type_index
 from pdbpy.msf import MultiStreamFileStream
+from pdbpy.parsing import StreamCursor
+from pdbpy.streams.hashtable import read_hash_table
+from pdbpy.streams.stringtable import PdbStringTableStream
 from pdbpy.streams.typestream.typestreamheader import PDBTypeStreamHeader
+from pdbpy.utils.arrays import u32_array, u32_group_by
 from pdbpy.utils.hash import Hash, get_hash_for_string
 
 TruncatedHash: TypeAlias = int
@@ -28,10 +35,20 @@ class PdbTypeHashStream:
     file: MultiStreamFileStream | bytes
     debug: bool
 
-    hash_memory: MemoryWrapper | bytes
+    hash_offset: int
     index_memory: MemoryWrapper | bytes
 
-    hash: dict[TruncatedHash, list[type_index]]
+    _bucket_index: Tuple[array, array] | None
+    _bucket_lock: threading.Lock
+    _bucket_thread: threading.Thread | None
+    budget: MemoryBudget | None
+
+    # The index-offset buffer decoded into parallel arrays, sorted by TI.
+    index_tis: array
+    index_offsets: array
+
+    # TIs from the hash adjustment buffer, which go first in their buckets.
+    adjustments: dict[TruncatedHash, list[type_index]]
 
     start_ti: type_index
     num_types: int
@@ -42,28 +59,99 @@ class PdbTypeHashStream:
         file: MultiStreamFileStream,
         type_header: PDBTypeStreamHeader,
         upfront_memory: bool = False,
+        background_buckets: bool = False,
+        names: PdbStringTableStream | None = None,
         debug: bool = False,
     ):
+        """
+        Only the index-offset buffer is read upfront; the hash values aren't touched until the first
+         lookup by name needs the buckets, so TI lookups don't pay for them.
+        With `background_buckets` they are built on a background thread right away instead.
+
+        Incrementally linked PDBs have a hash adjustment buffer, naming TIs that should be found before
+         any others with the same name. The names are in the "/names" stream, which has to be passed as `names`.
+        """
         self.file = file
         self.debug = debug
+        self.budget = getattr(file, "budget", None)
         if upfront_memory:
             self.file = bytes(file)
 
         hash_start = type_header.hash_value_buffer
-        self.hash_memory = self.file[hash_start.offset : hash_start.offset + hash_start.byte_count]  # type: ignore
+        self.hash_offset = int(hash_start.offset)
         index_start = type_header.index_offset_buffer
         self.index_memory = self.file[index_start.offset : index_start.offset + index_start.byte_count]  # type: ignore
+        index_pairs = u32_array(self.index_memory)
+        self.index_tis = index_pairs[0::2]
+        self.index_offsets = index_pairs[1::2]
 
-        self.hash = defaultdict(list)  # [[] for _ in range(self.header.buckets)]
         self.start_ti = type_header.ti_min
         self.num_types = int(hash_start.byte_count) // 4
         self.buckets = int(type_header.buckets)
-
-        ti = self.start_ti
-        trunc_hash: TruncatedHash
-        for (trunc_hash,) in struct.iter_unpack("<I", self.hash_memory):
-            self.hash[trunc_hash].append(ti)
-            ti += 1
+        self.adjustments = {}
+        adjustment_start = type_header.hash_adjustment_buffer
+        if adjustment_start.byte_count:
+            assert names is not None, "Need the /names stream to make sense of the hash adjustment buffer"
+            cursor = StreamCursor(
+                self.file,
+                int(adjustment_start.offset),
+                end=int(adjustment_start.offset + adjustment_start.byte_count),
+            )
+            for name_index, ti in read_hash_table(cursor):
+                truncated = self.truncate_hash(get_hash_for_string(names.get_string(name_index)))
+                self.adjustments.setdefault(truncated, []).append(ti)
+        self._bucket_index = None
+        self._bucket_lock = threading.Lock()
+        self._bucket_thread = None
+        if background_buckets:
+            self._bucket_thread = threading.Thread(target=self._build_bucket_index, daemon=True)
+            self._bucket_thread.start()
+
+    @property
+    def hash_memory(self) -> MemoryWrapper | bytes:
+        return self.file[self.hash_offset : self.hash_offset + 4 * self.num_types]
+
+    def _build_bucket_index(self) -> Tuple[array, array]:
+        with self._bucket_lock:
+            bucket_index = self._bucket_index
+            if bucket_index is not None:
+                return bucket_index
+            order, starts = u32_group_by(u32_array(self.hash_memory), self.buckets)
+            self._bucket_index = bucket_index = (order, starts)
+
+        if self.budget is not None:
+            byte_count = order.itemsize * len(order) + starts.itemsize * len(starts)
+            self.budget.charge(self, "buckets", byte_count)
+        return bucket_index
+
+    @property
+    def bucket_index(self) -> Tuple[array, array]:
+        """
+        The TIs grouped by bucket, built on first use: `(order, starts)` where the TIs in bucket `b`
+         are `start_ti + order[starts[b] : starts[b + 1]]`, see `u32_group_by`.
+        That's 4 bytes per type plus 4 per bucket, instead of a dict of lists of Python ints.
+        They're charged to the `MemoryBudget` if there is one, and rebuilt if it evicted them.
+        """
+        bucket_index = self._bucket_index
+        if bucket_index is not None:
+            if self.budget is not None:
+                self.budget.touch(self, "buckets")
+            return bucket_index
+        # Waits for a background build, if there is one going.
+        return self._build_bucket_index()
+
+    def budget_evict(self, key) -> None:
+        assert key == "buckets", f"Don't know how to evict {key}"
+        self._bucket_index = None
+
+    def get_tis_in_bucket(self, truncated: TruncatedHash) -> list[type_index]:
+        order, starts = self.bucket_index
+        start_ti = self.start_ti
+        tis = [start_ti + idx for idx in order[starts[truncated] : starts[truncated + 1]]]
+        adjusted = self.adjustments.get(truncated, None)
+        if adjusted:
+            tis = adjusted + [ti for ti in tis if ti not in adjusted]
+        return tis
 
     def truncate_hash(self, hash: Hash) -> TruncatedHash:
         return hash % self.buckets
@@ -74,9 +162,8 @@ class PdbTypeHashStream:
         The hash is the "bucket modulo limited" hash as written into the stream.
         """
         # 4 == see assert in __init__
-        dynamic_index: dynamic_type_index = dynamic_type_index(ti - self.start_ti)  # type: ignore
-        offset: int = dynamic_index.value * 4
-        return struct.unpack("<I", self.hash_memory[offset : offset + 4])[0]
+        offset: int = self.hash_offset + (ti - self.start_ti) * 4  # type: ignore
+        return struct.unpack("<I", bytes(self.file[offset : offset + 4]))[0]
 
     def get_possible_ti_for_string_by_hash(self, string: str) -> list[type_index]:
         """
@@ -85,55 +172,23 @@ class PdbTypeHashStream:
         """
         hash: Hash = get_hash_for_string(string)
         truncated = self.truncate_hash(hash)
-        return self.hash[truncated]
+        return self.get_tis_in_bucket(truncated)
 
-    def get_index_offset(self, idx: dynamic_type_index) -> TypeIndexOffset:
-        io_sizeof = c_sizeof(TypeIndexOffset)
-        offset = io_sizeof * idx.value
-        return TypeIndexOffset.from_buffer_copy(self.index_memory[offset : offset + io_sizeof])
+    def get_index_offset(self, idx: int) -> TypeIndexOffset:
+        return TypeIndexOffset(self.index_tis[idx], self.index_offsets[idx])
 
     def get_closest_start_pos_for_ti(self, ti: type_index) -> tuple[type_index, int]:
         """
         Returns the closest stored lookup position for a given type_index.
 
-        Returns a (idx, stream_byte_offset) with the `idx` as 0-start, not a type_index
+        Returns a (type_index, stream_byte_offset) of the closest record at or before `ti`,
+         with the offset relative to the start of the records.
         """
 
         assert ti >= self.start_ti, f"{ti} >= {self.start_ti}"  # type: ignore
 
-        ratio = float(ti - self.start_ti) / self.num_types  # type: ignore
-
-        io_sizeof = c_sizeof(TypeIndexOffset)
-        io_size = len(self.index_memory)
-        io_count = io_size // io_sizeof
-
-        guess_index = io_count * ratio
-        guess_index = dynamic_type_index(int(guess_index))  # Passing through int to floor the value.
-        last_dynamic_ti = dynamic_type_index(io_count - 1)
-
-        guess = self.get_index_offset(guess_index)
-
-        if guess_index.value == last_dynamic_ti:
-            return guess.ti, guess.byte_offset.value
-
-        if guess_index.value == 0:
-            return guess.ti, guess.byte_offset
-
-        if guess.ti == ti:
-            return guess.ti, guess.byte_offset
-
-        if guess.ti.value < ti.value:
-            # advance until not (limit || above)
-            next_guess = guess
-            while next_guess.ti.value < ti.value:
-                guess = next_guess
-                guess_index.value += 1
-                next_guess = self.get_index_offset(guess_index)
-        else:
-            # retreat until 0 or below
-            while guess.ti.value > ti.value:
-                guess_index.value -= 1
-                guess = self.get_index_offset(guess_index)
-
-        # print(f"Starting search at {guess}")
-        return guess.ti, guess.byte_offset.value
+        idx = bisect_right(self.index_tis, ti) - 1
+        if idx < 0:
+            # No entry that early (or no entries at all), start from the first record.
+            return self.start_ti, 0
+        return self.index_tis[idx], self.index_offsets[idx]
@@ -1,4 +1,3 @@
-from ctypes import sizeof as c_sizeof
 from typing import Optional
 
 from dtypes.structify import structify
@@ -7,7 +6,7 @@ from dtypes.typedefs import uint8_t, uint16_t
 from pdbpy.codeview import LeafID
 from pdbpy.codeview.types import type_index
 
-from .base import record, PackedStructy, FunctionAttributes
+from .base import record, PackedStructy, FunctionAttributes, header_size
 
 
 @record(LeafID.PROCEDURE)
@@ -23,7 +22,7 @@ class Procedure(PackedStructy):
 
     @classmethod
     def from_memory(cls, mem : memoryview, offset : int, record_size : Optional[int], debug : bool):
-        my_size = c_sizeof(cls)
+        my_size = header_size(cls)
         self = cls.from_buffer_copy(mem[offset: offset + my_size])
         self.addr = offset
         post_read_offset = offset + my_size
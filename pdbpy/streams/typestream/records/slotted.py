@@ -0,0 +1,148 @@
+import ctypes
+from typing import Any, Dict, List, Tuple
+
+from dtypes.structify import Structy
+
+from pdbpy.utils.ctypes import Flaggy
+from pdbpy.utils.decoder import get_decoder
+
+from .base import LazyTail, PackedStructy
+
+# The classes records (and their flags) are built on, whose insides aren't copied to the slotted classes
+_ctypes_bases = (object, ctypes.Structure, Structy, PackedStructy, Flaggy)
+
+
+class SlottedRecord:
+    """
+    Base class of the slotted variants of records, see `slotted_variant`.
+
+    Their `__class__` is the record class they stand in for, so `isinstance(record, Member)` and such hold for
+     them too. `type(record)` is the slotted class.
+    """
+
+    __slots__ = ()
+    _fields_: Tuple[tuple, ...] = ()
+    _header_size = 0
+    # The record class this stands in for
+    source_type: Any = None
+    # The slots that aren't fields, like `addr` and `name`
+    attribute_slots: Tuple[str, ...] = ()
+    slotted = True
+
+    @property  # type: ignore
+    def __class__(self):
+        return type(self).source_type
+
+    def __eq__(self, other):
+        # Compares equal to the ctypes version too, so `record.properties == TypeProperties(...)` keeps working.
+        if not isinstance(other, (type(self), self.source_type)):
+            return NotImplemented
+        return all(getattr(self, field[0]) == getattr(other, field[0]) for field in self._fields_)
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self):
+        names = [field[0] for field in self._fields_]
+        names += [name for name in type(self).attribute_slots if hasattr(self, name)]
+        return type(self).__name__ + str({name: getattr(self, name) for name in names})
+
+
+def _all_fields(ctype) -> List[tuple]:
+    # ctypes puts the fields of base classes first
+    return [field for klass in reversed(ctype.__mro__) for field in klass.__dict__.get("_fields_", ())]
+
+
+def _copied_members(ctype) -> Dict[str, Any]:
+    """
+    The properties, methods and class attributes of a record class (and its record base classes),
+     but not the ctypes machinery.
+    """
+    members: Dict[str, Any] = {}
+    field_names = {field[0] for field in _all_fields(ctype)}
+    for klass in reversed(ctype.__mro__):
+        if klass in _ctypes_bases or klass.__module__ == "_ctypes":
+            continue
+        for name, value in klass.__dict__.items():
+            if name in field_names or (name.startswith("__") and name not in ("__str__", "__getattr__")):
+                continue
+            if name in ("_fields_", "_pack_", "lazy_variant", "slotted"):
+                continue
+            members[name] = value
+    return members
+
+
+def _nested_property(slot: str, nested_type: type) -> property:
+    from_buffer_copy = nested_type.from_buffer_copy
+
+    def get(self):
+        return from_buffer_copy(getattr(self, slot))
+
+    return property(get)
+
+
+_slotted_variants: Dict[type, type] = {}
+
+
+def slotted_variant(ctype: type) -> type:
+    """
+    Returns (and caches) a plain Python class with `__slots__` that stands in for the record class `ctype`.
+
+    It has the same fields, properties and methods, and a slot for `addr` (of type records) and every name in
+     the `extra_attributes` of the record class, which its `from_memory` sets. Lazy records (see `LazyTail`)
+     get a slot for their tail, and stay lazy.
+    Its `from_buffer_copy` fills the slots with a `StructDecoder` instead of copying into a ctypes buffer, and
+     `from_memory` is the very same function as the ctypes class', which is why record classes use
+     `header_size(cls)` rather than `ctypes.sizeof(cls)`.
+    Nested structures (the flags) are kept as bytes, and made into (slotted) objects when they're accessed,
+     like ctypes makes a new object for every access of a nested structure.
+
+    Without a ctypes buffer and a `__dict__` per object, records take a lot less memory, and are quicker to make.
+    """
+    slotted = _slotted_variants.get(ctype, None)
+    if slotted is not None:
+        return slotted
+
+    fields = _all_fields(ctype)
+    attribute_slots: Tuple[str, ...] = tuple(getattr(ctype, "extra_attributes", ()))
+    if issubclass(ctype, PackedStructy):
+        attribute_slots = ("addr", *attribute_slots)
+    tail_slots = ("_tail",) if issubclass(ctype, LazyTail) else ()
+
+    members = _copied_members(ctype)
+    field_slots = []
+    for field in fields:
+        name, field_type = field[0], field[1]
+        if issubclass(field_type, ctypes.Structure):
+            field_slots.append(f"_{name}_data")
+            members[name] = _nested_property(f"_{name}_data", slotted_variant(field_type))
+        else:
+            field_slots.append(name)
+
+    members.update(
+        __slots__=(*field_slots, *attribute_slots, *tail_slots),
+        __module__=ctype.__module__,
+        __qualname__=f"Slotted{ctype.__qualname__}",
+        _fields_=tuple(fields),
+        _header_size=ctypes.sizeof(ctype),
+        attribute_slots=attribute_slots,
+        source_type=ctype,
+    )
+    slotted = type(f"Slotted{ctype.__name__}", (SlottedRecord,), members)
+
+    # Generated, so the fields go straight from the unpacked tuple into the slots.
+    # The class and helpers are default arguments, which are quicker to get at than globals.
+    namespace: Dict[str, Any] = {}
+    exec(
+        f"def from_buffer_copy(data, offset=0, _cls=_cls, _new=_new, _unpack_from=_unpack_from):\n"
+        "    self = _new(_cls)\n"
+        f"    {', '.join(f'self.{slot}' for slot in field_slots)}, = _unpack_from(data, offset)\n"
+        "    return self\n",
+        {"_cls": slotted, "_new": object.__new__, "_unpack_from": get_decoder(ctype, flatten=False).unpack_from},
+        namespace,
+    )
+    slotted.from_buffer_copy = staticmethod(namespace["from_buffer_copy"])
+    _slotted_variants[ctype] = slotted
+    return slotted
+
+
+__all__ = ("SlottedRecord", "slotted_variant")
@@ -1,4 +1,3 @@
-from ctypes import sizeof as c_sizeof
 from typing import Optional
 
 from dtypes.structify import structify
@@ -8,7 +7,7 @@ from pdbpy.codeview import LeafID
 from pdbpy.codeview.types import type_index
 from pdbpy.parsing import read_numeric, read_string
 
-from .base import record, PackedStructy, TypeProperties
+from .base import LazyTail, lazy_record, record, PackedStructy, TypeProperties, header_size
 
 
 structy_types = (LeafID.CLASS, LeafID.STRUCTURE, LeafID.INTERFACE, LeafID.CLASS_ST, LeafID.STRUCTURE_ST, LeafID.INTERFACE)
@@ -24,6 +23,8 @@ class TypeStructLike(PackedStructy):
     vshape        : type_index
     # followed by "data describing length of structure in bytes and name"? 🤔
 
+    extra_attributes = ("struct_size_bytes", "name", "unique_name")
+
     def __init__(self):
         self.addr = None
         self.struct_size_bytes = None
@@ -37,13 +38,16 @@ class TypeStructLike(PackedStructy):
     def from_memory(cls, mem : memoryview, offset : int, record_size : Optional[int], debug : bool):
 
 
-        my_size = c_sizeof(cls)
+        my_size = header_size(cls)
         self = cls.from_buffer_copy(mem[offset: offset + my_size])
         self.addr = offset
         #print(self)
 
+        return self.read_tail(mem, offset + my_size), self
+
+    def read_tail(self, mem : memoryview, offset : int) -> int:
         # Name reading from https://github.com/microsoft/microsoft-pdb/blob/e6b1dec61e154b568357537792e1d17a13525d5d/PDB/include/symtypeutils.h#L24        
-        name_offset, self.struct_size_bytes = read_numeric(mem, offset + my_size)
+        name_offset, self.struct_size_bytes = read_numeric(mem, offset)
         
         post_read_offset, name_data = read_string(mem, name_offset, self.record_type)
         self.name = name_data
@@ -52,11 +56,16 @@ class TypeStructLike(PackedStructy):
             #print(self.unique_name)
         #print(self.name)
 
+        return post_read_offset
 
-        return post_read_offset, self
-    
 
+@lazy_record(TypeStructLike)
+class LazyTypeStructLike(LazyTail, TypeStructLike):
+    """
+    `TypeStructLike` that decodes the size and names when they're first used.
+    """
+
+    lazy_attributes = ("struct_size_bytes", "name", "unique_name")
 
-        
 
-__all__ = ('TypeStructLike',)
+__all__ = ('TypeStructLike', 'LazyTypeStructLike')
@@ -0,0 +1,66 @@
+import sys
+from array import array
+from collections import Counter
+from itertools import accumulate
+from typing import Iterable, Tuple
+
+try:
+    import numpy
+except ImportError:  # numpy is optional, everything works without it, just slower for huge PDBs
+    numpy = None
+
+
+def u32_array(data) -> "array[int]":
+    """
+    Decodes a buffer of little-endian uint32 values into an `array('I')`.
+
+    >>> list(u32_array(b"\\x01\\x00\\x00\\x00\\xff\\xff\\xff\\xff"))
+    [1, 4294967295]
+    """
+    values = array("I")
+    values.frombytes(bytes(data))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def u32_prefix_sum(counts: Iterable[int]) -> "array[int]":
+    """
+    Returns an `array('I')` with one more entry than `counts`, where entry N is the sum of the first N counts.
+
+    >>> list(u32_prefix_sum([3, 0, 2]))
+    [0, 3, 3, 5]
+    """
+    return array("I", accumulate(counts, initial=0))
+
+
+def from_numpy_u32(values) -> "array[int]":
+    """
+    Turns a numpy array into an `array('I')`, so callers don't need to care whether numpy was used.
+    """
+    result = array("I")
+    result.frombytes(values.astype(numpy.uint32).tobytes())
+    return result
+
+
+def u32_group_by(values: "array[int]", group_count: int) -> Tuple["array[int]", "array[int]"]:
+    """
+    Groups the indices of `values` by their value (which must be below `group_count`), CSR style.
+    Returns `(order, starts)`, where `order` is a stable permutation of the indices sorted by value,
+     and the indices with value `v` are `order[starts[v] : starts[v + 1]]`.
+
+    >>> order, starts = u32_group_by(array("I", [2, 0, 2, 1]), 3)
+    >>> list(order), list(starts)
+    ([1, 3, 0, 2], [0, 1, 2, 4])
+    """
+    assert not values or max(values) < group_count, f"Values need to be below {group_count}"
+    if numpy is not None:
+        np_values = numpy.frombuffer(values, dtype=numpy.uint32)
+        order = numpy.argsort(np_values, kind="stable")
+        starts = numpy.zeros(group_count + 1, dtype=numpy.uint32)
+        numpy.cumsum(numpy.bincount(np_values, minlength=group_count), out=starts[1:])
+        return from_numpy_u32(order), from_numpy_u32(starts)
+
+    order = array("I", sorted(range(len(values)), key=values.__getitem__))
+    counts = Counter(values)
+    return order, u32_prefix_sum(counts.get(value, 0) for value in range(group_count))
@@ -23,7 +23,7 @@ class Flaggy(ctypes.Structure):
     
     def __eq__(self, other):
         if type(self) != type(other):
-            return False
+            return NotImplemented
 
         for field, typ, bits in self._fields_:
             if getattr(self, field) != getattr(other, field):
@@ -31,6 +31,15 @@ class Flaggy(ctypes.Structure):
         return True
 
 
+def header_size(cls) -> int:
+    """
+    The size of the fixed part of a record class, `ctypes.sizeof` for the ctypes classes.
+    Works for their slotted variants too (see `slotted_variant`), which is why `from_memory` uses this.
+    """
+    size = getattr(cls, "_header_size", None)
+    return ctypes.sizeof(cls) if size is None else size
+
+
 # https://stackoverflow.com/questions/23131237/python-ctype-bitfields-get-bitfield-location
 def DebugPrintBitfield(Type):
     for field_descr in Type._fields_:        
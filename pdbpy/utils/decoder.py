@@ -0,0 +1,177 @@
+import ctypes
+import struct
+from typing import Any, Callable, Dict, List, Tuple
+
+# struct codes with standard sizes, by (size, signed) for integers
+_integer_codes = {
+    (1, True): "b",
+    (1, False): "B",
+    (2, True): "h",
+    (2, False): "H",
+    (4, True): "i",
+    (4, False): "I",
+    (8, True): "q",
+    (8, False): "Q",
+}
+
+
+def _struct_code(ctype) -> str:
+    """
+    The struct code of a simple ctypes type. ctypes codes like "l" depend on the platform, so integers
+     are picked by their size instead.
+    """
+    code = ctype._type_
+    if code in "fd?c":
+        return code
+    return _integer_codes[(ctypes.sizeof(ctype), code.islower())]
+
+
+def _fields_with_descriptors(ctype):
+    """
+    (name, type, descriptor) of every field of a structure, base class fields first, like ctypes lays them out.
+    """
+    for klass in reversed(ctype.__mro__):
+        for field in klass.__dict__.get("_fields_", ()):
+            yield field[0], field[1], klass.__dict__[field[0]]
+
+
+class StructDecoder:
+    """
+    Decodes the fields of a ctypes structure (or simple type) with a single `struct.Struct.unpack_from`,
+     instead of constructing the ctypes object.
+
+    The layout is taken from the ctypes field descriptors, so it's the same as ctypes' own, packing included.
+    Nested structures are flattened, with their fields named like "properties.packed".
+    Bitfields are shifted and masked out of their storage unit, arrays of bytes come out as `bytes`,
+     and other arrays as tuples.
+
+    `unpack_from(buffer, offset)` returns the values in the order of `names`. Where there are bitfields or arrays
+     to pick apart, it's generated Python around the unpack, otherwise it's the unpack itself.
+
+    Without `flatten`, nested structures come out as the `bytes` they're made of instead.
+    """
+
+    def __init__(self, ctype, flatten: bool = True):
+        self.ctype = ctype
+        self.flatten = flatten
+        self.size = ctypes.sizeof(ctype)
+        self.names: Tuple[str, ...] = ()
+
+        # byte offset -> (struct code, element count) of every storage unit,
+        #  and (name, storage unit offset, expression template) of every field
+        self._units: Dict[int, Tuple[str, int]] = {}
+        self._values: List[Tuple[str, int, str]] = []
+        if issubclass(ctype, ctypes.Structure):
+            self._add_structure(ctype, 0, "")
+        else:
+            self._add_field("value", ctype, 0, 0, 0)
+
+        fmt = "<"
+        pos = 0
+        unit_vars: Dict[int, List[str]] = {}
+        for unit_offset in sorted(self._units):
+            code, count = self._units[unit_offset]
+            assert unit_offset >= pos, f"Overlapping fields at {unit_offset} in {ctype.__name__}"
+            if unit_offset > pos:
+                fmt += f"{unit_offset - pos}x"
+            unit_fmt = code if count == 1 else f"{count}{code}"
+            fmt += unit_fmt
+            pos = unit_offset + struct.calcsize("<" + unit_fmt)
+            # "s" is a single bytes value, anything else is one value per element
+            unit_vars[unit_offset] = [f"u{unit_offset}_{idx}" for idx in range(1 if code == "s" else count)]
+        assert pos <= self.size, f"Fields of {ctype.__name__} reach past its size"
+        self.struct = struct.Struct(fmt)
+
+        self.names = tuple(name for name, _, _ in self._values)
+        unpacked = ", ".join(var for unit_offset in sorted(unit_vars) for var in unit_vars[unit_offset])
+        values = ", ".join(expression.format(*unit_vars[unit_offset]) for _, unit_offset, expression in self._values)
+        source = (
+            "def unpack_from(buffer, offset=0):\n"
+            f"    {unpacked}, = _unpack_from(buffer, offset)\n"
+            f"    return ({values},)\n"
+        )
+        self.source = source
+        self.unpack_from: Callable[..., Tuple[Any, ...]] = self.struct.unpack_from
+        if any(expression != "{0}" for _, _, expression in self._values) or len(self._values) != len(self._units):
+            namespace: Dict[str, Any] = {"_unpack_from": self.struct.unpack_from}
+            exec(source, namespace)
+            self.unpack_from = namespace["unpack_from"]
+        # else the struct already unpacks the values as they are, no need to go through Python
+
+    def _add_structure(self, ctype, base_offset: int, prefix: str) -> None:
+        for name, field_type, descriptor in _fields_with_descriptors(ctype):
+            if hasattr(descriptor, "is_bitfield"):
+                bit_size = descriptor.bit_size if descriptor.is_bitfield else 0
+                bit_offset = descriptor.bit_offset if descriptor.is_bitfield else 0
+            else:
+                # Before 3.13, the size of a bitfield has the bit count in the high 16 bits and the offset in the low
+                bit_size = descriptor.size >> 16
+                bit_offset = descriptor.size & 0xFFFF if bit_size else 0
+            self._add_field(prefix + name, field_type, base_offset + descriptor.offset, bit_size, bit_offset)
+
+    def _add_field(self, name: str, ctype, offset: int, bit_size: int, bit_offset: int) -> None:
+        if issubclass(ctype, ctypes.Structure):
+            if self.flatten:
+                self._add_structure(ctype, offset, name + ".")
+            else:
+                self._add_unit(offset, "s", ctypes.sizeof(ctype))
+                self._values.append((name, offset, "{0}"))
+            return
+
+        if issubclass(ctype, ctypes.Array):
+            element_code = _struct_code(ctype._type_)
+            if ctypes.sizeof(ctype._type_) == 1 and element_code != "?":
+                self._add_unit(offset, "s", ctype._length_)
+                self._values.append((name, offset, "{0}"))
+            else:
+                self._add_unit(offset, element_code, ctype._length_)
+                elements = ", ".join(f"{{{idx}}}" for idx in range(ctype._length_))
+                self._values.append((name, offset, f"({elements},)"))
+            return
+
+        code = _struct_code(ctype)
+        self._add_unit(offset, code, 1)
+        if not bit_size:
+            self._values.append((name, offset, "{0}"))
+            return
+        mask = (1 << bit_size) - 1
+        expression = f"(({{0}} >> {bit_offset}) & {mask})"
+        if code.islower():
+            # Signed bitfields are sign extended, like ctypes does.
+            sign = 1 << (bit_size - 1)
+            expression = f"(({expression} ^ {sign}) - {sign})"
+        self._values.append((name, offset, expression))
+
+    def _add_unit(self, offset: int, code: str, count: int) -> None:
+        existing = self._units.setdefault(offset, (code, count))
+        assert existing == (code, count), f"Fields of different types share offset {offset}"
+
+    def unpack_dict(self, buffer, offset: int = 0) -> Dict[str, Any]:
+        return dict(zip(self.names, self.unpack_from(buffer, offset)))
+
+    def __repr__(self):
+        return f"StructDecoder({self.ctype.__name__}, {self.struct.format!r})"
+
+
+_decoders: Dict[Tuple[Any, bool], StructDecoder] = {}
+
+
+def get_decoder(ctype, flatten: bool = True) -> StructDecoder:
+    """
+    Returns the (cached) `StructDecoder` of a ctypes structure or simple type.
+
+    >>> from dtypes.typedefs import uint16_t
+    >>> from pdbpy.streams.typestream.records.base import TypeProperties
+    >>> get_decoder(uint16_t).unpack_from(b"\\x00\\x34\\x12", 1)
+    (4660,)
+    >>> properties = get_decoder(TypeProperties).unpack_dict(bytes([0x80, 0x02]))
+    >>> properties["is_forward_definition"], properties["has_unique_name"], properties["packed"]
+    (1, 1, 0)
+    """
+    decoder = _decoders.get((ctype, flatten), None)
+    if decoder is None:
+        decoder = _decoders[ctype, flatten] = StructDecoder(ctype, flatten)
+    return decoder
+
+
+__all__ = ("StructDecoder", "get_decoder")
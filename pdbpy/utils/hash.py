@@ -1,11 +1,15 @@
 import struct
-from typing import TypeAlias
+from typing import TypeAlias, Union
 
 Hash: TypeAlias = int
 
 
-def get_hash_for_string(str: str) -> Hash:
-    buff: bytes = str.encode("utf8")
+def get_hash_for_string(string: Union[str, bytes]) -> Hash:
+    """
+    Hashes a name like the PDB does. Names that aren't valid UTF-8 are kept as bytes (see `decode_string`),
+     and are hashed as they are.
+    """
+    buff: bytes = string if isinstance(string, bytes) else string.encode("utf8")
     res: int = 0
     whole_uint32_count = int(len(buff) / 4)
     for (u32,) in struct.iter_unpack("<I", buff[0 : 4 * whole_uint32_count]):
@@ -198,17 +198,13 @@ class ResolveCache(object):
         if cached is not None:
             return cached
                 
-        typ = self.type_stream.get_by_type_index(ti)
-        if isinstance(typ, pdbpy.streams.typestream.TypeStructLike):
-            if typ.properties.is_forward_definition:
-                real_ti, real_typ = self.type_stream.get_structy_by_name(name = typ.name)
-                wrappy = self.cache.get(real_ti, None)
-                if wrappy is None:
-                    wrappy = wrap(real_typ, self)
-                    self.cache[real_ti] = wrappy
-        else:
-            wrappy = wrap(typ, self)
-        
+        # Forward declarations resolve to the same wrapper as their definition.
+        real_ti = self.type_stream.resolve_forward(ti)
+        wrappy = self.cache.get(real_ti, None)
+        if wrappy is None:
+            wrappy = wrap(self.type_stream.get_by_type_index(real_ti), self)
+            self.cache[real_ti] = wrappy
+
         self.cache[ti] = wrappy
         return wrappy
 
@@ -1,22 +1,60 @@
+import ctypes
+import gc
+import mmap
+import random
+import struct
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 import pytest
+from memorywrapper import MemoryWrapper
 
+from pdbpy.budget import MemoryBudget
 from pdbpy.codeview import LeafID
+from pdbpy.codeview.records.symbols import associate_symbols
 from pdbpy.codeview.records.symbols.datasym import DataSym
 from pdbpy.codeview.symbols import SymEnum
-from pdbpy.msf import MultiStreamFile
+from pdbpy.msf import MultiStreamFile, MultiStreamFileStream, coalesce_pages
+from pdbpy.pagesource import BufferPageSource, CallbackPageSource, PreadPageSource, RangePageSource
+from pdbpy.parsing import (
+    LeafNumericToCType,
+    StreamCursor,
+    StringInterner,
+    read_numeric,
+    read_string,
+    read_terminated,
+    set_string_interner,
+)
+from pdbpy import pdb as pdb_module
 from pdbpy.pdb import PDB
 from pdbpy.primitivetypes import BasicTypeEnum, BasicTypeInfo, BasicTypeModifier
 from pdbpy.streams.debuginformationstream.debuginformationstream import PdbDebugInformationStream
-from pdbpy.streams.directorystream import StreamDirectoryStream
-from pdbpy.streams.pdbinfo import PdbInfoStream
+from pdbpy.streams.directorystream import StreamDirectoryStream, streamdirectory
+from pdbpy.streams.pdbinfo import PDBInfoHeader, PdbInfoStream
+from pdbpy.streams.stringtable import STRING_TABLE_SIGNATURE, PdbStringTableStream
 from pdbpy.streams.symbolsstream import PdbSymbolRecordStream
+from pdbpy.streams.symbolsstream.symbolsstream import SymbolInformation
+from pdbpy.streams.typestream.parse import unsupported_leaves
 from pdbpy.streams.typestream.pdbtypestream import PdbTypeStream
-from pdbpy.streams.typestream.records import FieldList, Member, Pointer, TypeStructLike
-from pdbpy.streams.typestream.records.base import PointerModeEnum, PointerTypeEnum, TypeProperties
+from pdbpy.streams.typestream.records import (
+    FieldList,
+    FieldListMembers,
+    LazyFieldList,
+    LazyMember,
+    LazyTypeStructLike,
+    Member,
+    OpaqueRecord,
+    Pointer,
+    TypeStructLike,
+)
+from pdbpy.streams.typestream.records.base import PointerModeEnum, PointerTypeEnum, TypeProperties, records_by_id
 from pdbpy.streams.typestream.records.pdbtypehashstream import PdbTypeHashStream
+from pdbpy.streams.typestream.records.slotted import slotted_variant
+from pdbpy.streams.typestream.records.structlike import structy_types
+from pdbpy.streams.typestream.typestreamheader import PDBTypeStreamHeader
+from pdbpy.utils import arrays
+from pdbpy.utils.decoder import get_decoder
+from pdbpy.utils.hash import get_hash_for_string
 
 
 @pytest.fixture
@@ -82,10 +120,299 @@ def test_can_open(setup_windows_pdb: MultiStreamFile):
     assert setup_windows_pdb is not None
 
 
+def test_coalesce_pages():
+    assert coalesce_pages([]) == []
+    assert coalesce_pages([3]) == [(3, 1)]
+    assert coalesce_pages([7, 8, 9, 2, 3, 11]) == [(7, 3), (2, 2), (11, 1)]
+
+
+def test_map_pages_one_view_per_run(setup_windows_pdb: MultiStreamFile):
+    msf = setup_windows_pdb
+    page_size = msf.page_size
+    page_list = [7, 8, 9, 2, 3]
+
+    views = msf.map_pages(page_list, byte_offset=100, byte_count=4 * page_size)
+    assert [len(view) for view in views] == [3 * page_size - 100, page_size + 100]
+
+    expected = b"".join(bytes(msf.mem[page * page_size : (page + 1) * page_size]) for page in page_list)
+    assert b"".join(views) == expected[100 : 100 + 4 * page_size]
+
+
+def test_stream_contiguous_view_or_stitched_copy(setup_windows_pdb: MultiStreamFile):
+    msf = setup_windows_pdb
+    page_size = msf.page_size
+    stream = MultiStreamFileStream(msf, page_list=[7, 8, 2], size_bytes=3 * page_size, streamname="extents")
+    expected = msf.read_pages([7, 8, 2])
+
+    inside = stream.read_view(10, page_size)
+    assert inside.obj is msf.mmap
+    assert inside == expected[10 : 10 + page_size]
+
+    across = stream.read_view(2 * page_size - 8, 16)
+    assert across.obj is not msf.mmap
+    assert across == expected[2 * page_size - 8 : 2 * page_size + 8]
+
+    assert isinstance(stream[0:page_size], memoryview)
+    assert isinstance(stream[page_size:-1], MemoryWrapper)
+    assert bytes(stream[page_size:-1]) == expected[page_size:-1]
+    assert stream[2 * page_size] == expected[2 * page_size]
+
+    assert (stream.stats.contiguous, stream.stats.stitched, stream.stats.wrapped) == (3, 1, 2)
+
+
+def test_stream_chunk_cache(setup_windows_pdb: MultiStreamFile):
+    msf = setup_windows_pdb
+    page_size = msf.page_size
+    page_list = [7, 2, 9, 4]
+    stream = MultiStreamFileStream(msf, page_list=page_list, size_bytes=4 * page_size, streamname="chunks")
+    stream.enable_chunk_cache(chunk_size=2 * page_size, budget_bytes=2 * page_size)
+    expected = msf.read_pages(page_list)
+
+    first = stream.read_view(page_size - 8, 16)
+    assert first == expected[page_size - 8 : page_size + 8]
+    assert stream[page_size - 4 : page_size + 4] == expected[page_size - 4 : page_size + 4]
+    assert (stream.stats.chunk_misses, stream.stats.chunk_hits) == (1, 1)
+
+    # Second chunk evicts the first one from the budget, so touching the first chunk again misses.
+    assert stream.read_view(3 * page_size - 8, 16) == expected[3 * page_size - 8 : 3 * page_size + 8]
+    assert stream.read_view(page_size - 8, 16) == first
+    assert (stream.stats.chunk_misses, stream.stats.chunk_hits) == (3, 1)
+
+    # Contiguous reads don't need the cache, and ranges crossing chunks are still stitched.
+    assert stream.read_view(0, 16).obj is msf.mmap
+    assert stream.read_view(2 * page_size - 8, 16) == expected[2 * page_size - 8 : 2 * page_size + 8]
+    assert (stream.stats.contiguous, stream.stats.stitched) == (1, 1)
+
+
+def test_stream_cursor_read_ahead():
+    data = b"\x04\x00" + b"\x04\x80\xfe\xff\xff\xff" + b"a_long_member_name\x00" + b"\x05hello" + b"\x00\x00"
+    # Split into several sources and use a tiny window to make every read cross a refill.
+    cursor = StreamCursor(MemoryWrapper([data[:5], data[5:13], data[13:]]), read_ahead=3)
+
+    assert cursor.read_u16() == 4
+    assert cursor.read_numeric() == 0xFFFFFFFE
+    assert cursor.read_stringz() == "a_long_member_name"
+    assert cursor.read_string(LeafID.ONEMETHOD_ST) == "hello"
+    cursor.align(4)
+    assert cursor.at_end()
+
+
+def test_read_string_in_bulk():
+    # Like a stream with a name going across two pages, and one that's longer than the search window.
+    first, second = b"\x00Sup", b"er\x00" + b"x" * 300 + b"\x00"
+    mem = MemoryWrapper([memoryview(first), memoryview(second)], length=len(first) + len(second))
+    assert read_string(mem, 1, LeafID.MEMBER) == (7, "Super")
+    assert read_string(mem, 7, LeafID.MEMBER) == (308, "x" * 300)
+    assert read_terminated(b"abc\x00", 0) == b"abc"
+
+    previous = set_string_interner(StringInterner())
+    try:
+        names = [read_string(memoryview(b"Super\x00Super\x00"), offset, LeafID.MEMBER)[1] for offset in (0, 6)]
+    finally:
+        set_string_interner(previous)
+    assert names[0] is names[1]
+
+
+def test_prefetch_hints_ahead_of_sequential_scans(setup_windows_pdb: MultiStreamFile):
+    msf = setup_windows_pdb
+    page_size = msf.page_size
+    prefetcher = msf.enable_prefetch(ahead_bytes=2 * page_size)
+    stream = MultiStreamFileStream(msf, page_list=[7, 8, 9, 2, 3], size_bytes=5 * page_size, streamname="scan")
+
+    cursor = StreamCursor(stream, read_ahead=page_size, sequential=True)
+    while not cursor.at_end():
+        cursor.read(page_size)
+
+    # Both runs of pages got hinted, and everything but the first window was hinted before it was read.
+    assert prefetcher.stats.hints >= 2
+    assert prefetcher.stats.avoided_faults * mmap.PAGESIZE == 4 * page_size
+
+    # Lookups don't report anything.
+    hints = prefetcher.stats.hints
+    StreamCursor(stream, read_ahead=page_size).read(page_size)
+    assert prefetcher.stats.hints == hints
+
+    # Sources that don't take hints don't report anything either.
+    with open("example_pdbs/minimal.pdb", "rb") as f:
+        buffered = MultiStreamFile(BufferPageSource(f.read()))
+    prefetcher = buffered.enable_prefetch(ahead_bytes=2 * page_size)
+    stream = MultiStreamFileStream(buffered, page_list=[7, 8, 9, 2, 3], size_bytes=5 * page_size, streamname="scan")
+    cursor = StreamCursor(stream, read_ahead=page_size, sequential=True)
+    while not cursor.at_end():
+        cursor.read(page_size)
+    assert (prefetcher.stats.hints, prefetcher.stats.hinted_pages, prefetcher.stats.avoided_faults) == (0, 0, 0)
+
+
+def test_memory_budget_evicts_and_releases():
+    with open("example_pdbs/minimal.pdb", "rb") as f:
+        budget = MemoryBudget(limit_bytes=4 * 4096)
+        msf = MultiStreamFile(f, budget=budget)
+    page_size = msf.page_size
+    page_list = [7, 2, 9, 4, 11, 13]
+    stream = MultiStreamFileStream(msf, page_list=page_list, size_bytes=6 * page_size, streamname="budget")
+    stream.enable_chunk_cache(chunk_size=2 * page_size)
+    expected = msf.read_pages(page_list)
+
+    # Each read crosses runs of pages, within a chunk of two pages.
+    for chunk_idx in range(3):
+        offset = (2 * chunk_idx + 1) * page_size - 8
+        assert stream[offset : offset + 16] == expected[offset : offset + 16]
+    # Only the two most recent chunks fit.
+    assert budget.used_bytes == 4 * page_size
+    assert sorted(stream._chunks) == [1, 2]
+    assert budget.stats.evictions == 1
+
+    # Scans hand back what they have moved past.
+    cursor = StreamCursor(stream, read_ahead=page_size, sequential=True)
+    while not cursor.at_end():
+        cursor.read(page_size)
+    assert budget.stats.released_bytes == 5 * page_size
+
+    # Dead streams don't keep their charges around.
+    del stream, cursor
+    gc.collect()
+    assert budget.used_bytes == 0
+
+
+def test_memory_budget_rebuilds_evicted_indices():
+    budget = MemoryBudget(limit_bytes=1024 * 1024)
+    pdb = PDB("example_pdbs/minimal.pdb", budget=budget)
+    assert pdb.types.get_structy_by_name("Yolo")[0] == 4099
+    assert budget.used_bytes > 0
+
+    budget.set_limit(0)
+    assert pdb.types.hash_stream._bucket_index is None
+    assert pdb.types.get_structy_by_name("Yolo")[0] == 4099
+
+
+@pytest.mark.parametrize("source_kind", ["mmap", "bytes", "pread", "callback"])
+def test_page_sources(source_kind: str):
+    with open("example_pdbs/minimal.pdb", "rb") as f:
+        blob = f.read()
+        page_size = 4096
+        fetched_pages: List[int] = []
+
+        def fetch(page_no: int) -> bytes:
+            fetched_pages.append(page_no)
+            return blob[page_no * page_size : (page_no + 1) * page_size]
+
+        sources = {
+            "mmap": lambda: f,
+            "bytes": lambda: blob,
+            "pread": lambda: PreadPageSource(f, cache_pages=4),
+            "callback": lambda: CallbackPageSource(fetch),
+        }
+        msf = MultiStreamFile(sources[source_kind]())
+
+        directory = StreamDirectoryStream(msf.get("Directory"))
+        type_stream = PdbTypeStream(directory.get_stream_by_index(2))
+        hash_file = directory.get_stream_by_index(int(type_stream.header.hash_stream_number))
+        type_stream.set_hash_stream(PdbTypeHashStream(hash_file, type_stream.header))
+
+        (ti, record), *_ = type_stream.get_ti_and_record_for_name(name="Yolo")
+        assert ti == 4099
+        assert record.unique_name == ".?AUYolo@@"
+
+        if source_kind == "callback":
+            # Only the header, directory and the type streams were needed, not the whole file.
+            assert sorted(set(fetched_pages)) == [0, 20, 23, 25, 26]
+
+
+def test_range_page_source_only_fetches_touched_pages():
+    blob = Path("example_pdbs/minimal.pdb").read_bytes()
+    reads: List[Tuple[int, int]] = []
+
+    def read_range(offset: int, count: int) -> bytes:
+        reads.append((offset, count))
+        return blob[offset : offset + count]
+
+    source = RangePageSource(read_range)
+    pdb = PDB(source)
+    ti, record = pdb.types.get_structy_by_name("Yolo")
+    assert ti == 4099
+    assert record.name == "Yolo"
+
+    assert source.fetches == len(reads)
+    assert source.fetched_bytes < len(blob) // 4
+    assert sorted(source.pages) == [0, 20, 23, 25, 26]
+
+    # Everything needed is cached now, asking again doesn't fetch anything.
+    pdb.types.get_structy_by_name("Yolo")
+    assert source.fetches == len(reads)
+
+    # A stream over several runs of pages (the type stream on page 20, then two pages elsewhere)
+    #  only fetches the pages that lookups actually touch, not the whole stream.
+    source = RangePageSource(read_range)
+    msf = MultiStreamFile(source)
+    page_size = msf.page_size
+    opened = set(source.pages)
+    stream = MultiStreamFileStream(msf, page_list=[20, 2, 9], size_bytes=3 * page_size, streamname="scattered")
+    types = PdbTypeStream(stream, record_cache_entries=0)
+    assert types.get_by_type_index(4099).name == "Yolo"
+    assert set(source.pages) - opened == {20}
+
+    # Reads across runs only fetch the pages they cross.
+    crossing = blob[21 * page_size - 2 : 21 * page_size] + blob[2 * page_size : 2 * page_size + 2]
+    assert bytes(stream[page_size - 2 : page_size + 2]) == crossing
+    assert set(source.pages) - opened == {20, 2}
+
+
 def test_directory_exists(setup_directory_stream: StreamDirectoryStream):
     assert setup_directory_stream is not None
 
 
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_directory_decodes_page_lists_on_demand(
+    setup_windows_pdb: MultiStreamFile, monkeypatch: pytest.MonkeyPatch, use_numpy: bool
+):
+    converted_dtypes = []
+    if use_numpy:
+        pytest.importorskip("numpy")
+
+        def from_numpy_u32(values):
+            converted_dtypes.append(values.dtype.name)
+            return arrays.from_numpy_u32(values)
+
+        monkeypatch.setattr(streamdirectory, "from_numpy_u32", from_numpy_u32)
+    else:
+        monkeypatch.setattr(arrays, "numpy", None)
+
+    directory = StreamDirectoryStream(setup_windows_pdb.get("Directory"))
+    # The page count sum stays in integers
+    assert converted_dtypes == (["uint64"] if use_numpy else [])
+    assert directory.stream_count == 22
+    assert directory.get_stream_size(3) == 985
+    assert list(directory.get_page_list(3)) == [16]
+    assert directory.get_stream_size(20) == 0xFFFFFFFF
+    assert list(directory.get_page_list(20)) == []
+    assert directory.page_list_offsets[-1] == 17
+
+    stream = directory.get_stream_by_index(4)
+    assert list(stream.page_list) == [22]
+    assert len(stream) == 1054
+
+
+def test_directory_stream_cache(setup_directory_stream: StreamDirectoryStream):
+    hash_stream = setup_directory_stream.get_stream_by_index(7)
+    assert setup_directory_stream.get_stream_by_index(7) is hash_stream
+
+
+def test_directory_weak_stream_cache(setup_windows_pdb: MultiStreamFile):
+    directory = StreamDirectoryStream(setup_windows_pdb.get("Directory"), weak_stream_cache=True)
+    stream = directory.get_stream_by_index(3)
+    assert directory.get_stream_by_index(3) is stream
+    assert setup_windows_pdb.get(3) is stream
+
+    del stream
+    gc.collect()
+    with pytest.raises(ValueError):
+        setup_windows_pdb.get(3)
+
+    reopened = directory.get_stream_by_index(3)
+    assert len(reopened) == 985
+    assert setup_windows_pdb.get(3) is reopened
+
+
 def test_directory_info_exists(setup_info_stream: PdbInfoStream):
     assert setup_info_stream is not None
 
@@ -111,6 +438,524 @@ def test_type_lookup_by_type_index(setup_type_stream: PdbTypeStream):
     assert ptr.attributes.mode == PointerModeEnum.Normal
 
 
+def test_type_offset_index(setup_type_stream: PdbTypeStream):
+    walked = [(pos, info.ti, info.size_bytes, info.record_type) for pos, info in setup_type_stream.iter_ti_headers()]
+
+    # A tiny window makes records straddle the copies.
+    offsets = setup_type_stream.build_offset_index(window_size=64)
+    assert list(offsets) == [pos for pos, *_ in walked]
+
+    for pos, ti, size_bytes, record_type in walked:
+        found_pos, info = setup_type_stream.get_ti_info(ti)
+        assert (found_pos, info.ti, info.size_bytes, info.record_type) == (pos, ti, size_bytes, record_type)
+    assert isinstance(setup_type_stream.get_by_type_index(ti=4100), Pointer)
+
+
+@pytest.mark.parametrize("with_hash_stream", [True, False])
+def test_type_lookup_skip_cache(setup_type_stream: PdbTypeStream, with_hash_stream: bool):
+    walked = [(pos, info.ti) for pos, info in setup_type_stream.iter_ti_headers()]
+    type_stream = PdbTypeStream(setup_type_stream.file, lookup_skip=4)
+    if with_hash_stream:
+        type_stream.set_hash_stream(setup_type_stream.hash_stream)
+
+    # Backwards, so early lookups can't reuse what was cached by the ones before them.
+    for pos, ti in reversed(walked):
+        assert type_stream.get_ti_info(ti)[0] == pos
+    assert all(idx % 4 == 0 for idx in type_stream.lookup_indices)
+    assert list(type_stream.lookup_offsets) == [walked[idx][0] for idx in type_stream.lookup_indices]
+
+    # Cached offsets are never more than `lookup_skip` records away once the stream has been walked.
+    for pos, ti in walked:
+        start_index, _ = type_stream.get_closest_start_pos_for_ti(ti)
+        assert 0 <= type_stream.absolute_to_dynamic(ti) - start_index < 4
+
+    type_stream.set_lookup_skip(2)
+    type_stream.get_ti_info(walked[-1][1])
+    assert type_stream.absolute_to_dynamic(walked[-1][1]) - type_stream.lookup_indices[-1] < 2
+
+
+def test_type_lookup_cache_charges_once_per_scan(monkeypatch):
+    budget = MemoryBudget(limit_bytes=1024 * 1024)
+    charges = []
+    charge = budget.charge
+
+    def spy(owner, key, byte_count):
+        charges.append(key)
+        charge(owner, key, byte_count)
+
+    monkeypatch.setattr(budget, "charge", spy)
+    pdb = PDB("example_pdbs/minimal.pdb", budget=budget)
+    type_stream = PdbTypeStream(pdb.directory.get_stream_by_index(2), lookup_skip=1)
+    walked = [(pos, info.ti) for pos, info in type_stream.iter_ti_headers()]
+    assert list(type_stream.lookup_offsets) == [pos for pos, _ in walked]
+    assert charges == ["lookup"]
+
+    # Offsets from before the end of what's known are inserted in order.
+    type_stream.budget_evict("lookup")
+    type_stream.set_lookup_skip(2)
+    type_stream.get_ti_info(walked[4][1])
+    assert list(type_stream.lookup_indices) == [0, 2, 4]
+    for idx in (3, 1, 3):
+        type_stream.add_lookup(idx, walked[idx][0])
+    assert list(type_stream.lookup_indices) == [0, 1, 2, 3, 4]
+    assert list(type_stream.lookup_offsets) == [walked[idx][0] for idx in type_stream.lookup_indices]
+
+
+def test_hash_stream_closest_start_pos():
+    ti_min, num_types = 0x1000, 20000
+    # Skewed like real PDBs can be: dense at the start, sparse after.
+    index_tis = list(range(ti_min + 3, ti_min + 300)) + list(range(ti_min + 300, ti_min + num_types, 1500))
+    index = b"".join(struct.pack("<II", ti, (ti - ti_min) * 16) for ti in index_tis)
+    hashes = bytes(4 * num_types)
+
+    header = PDBTypeStreamHeader()
+    header.ti_min, header.ti_max, header.buckets = ti_min, ti_min + num_types, 0x3FFFF
+    header.hash_value_buffer.offset, header.hash_value_buffer.byte_count = 0, len(hashes)
+    header.index_offset_buffer.offset, header.index_offset_buffer.byte_count = len(hashes), len(index)
+    hash_stream = PdbTypeHashStream(hashes + index, header)
+
+    assert hash_stream.get_closest_start_pos_for_ti(ti_min + 1) == (ti_min, 0)
+    for ti in range(ti_min + 3, ti_min + num_types, 7):
+        closest = max(index_ti for index_ti in index_tis if index_ti <= ti)
+        assert hash_stream.get_closest_start_pos_for_ti(ti) == (closest, (closest - ti_min) * 16)
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_hash_stream_buckets(setup_type_stream: PdbTypeStream, monkeypatch: pytest.MonkeyPatch, use_numpy: bool):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(arrays, "numpy", None)
+
+    hash_stream = PdbTypeHashStream(setup_type_stream.hash_stream.file, setup_type_stream.header)
+    expected: Dict[int, List[int]] = {}
+    for ti in range(hash_stream.start_ti, hash_stream.start_ti + hash_stream.num_types):
+        expected.setdefault(hash_stream.get_hash_for_ti(ti), []).append(ti)
+
+    for bucket in range(hash_stream.buckets):
+        assert hash_stream.get_tis_in_bucket(bucket) == expected.get(bucket, [])
+    assert [ti for ti, _ in setup_type_stream.get_ti_and_record_for_name(name="Yolo")] == [4099]
+
+
+@pytest.mark.parametrize("background", [False, True])
+def test_hash_stream_buckets_are_built_on_demand(background: bool):
+    pdb = PDB("example_pdbs/minimal.pdb", background_type_buckets=background)
+    hash_stream = pdb.types.hash_stream
+    if background:
+        hash_stream._bucket_thread.join()
+        assert hash_stream._bucket_index is not None
+    else:
+        assert isinstance(pdb.types.get_by_type_index(ti=4100), Pointer)
+        assert hash_stream._bucket_index is None
+
+    assert pdb.types.get_structy_by_name("Yolo")[0] == 4099
+    assert hash_stream._bucket_index is not None
+
+
+def test_hash_stream_adjustments():
+    names = PdbStringTableStream(struct.pack("<III", STRING_TABLE_SIGNATURE, 1, 5) + b"\0Foo\0")
+    assert names.get_string(1) == "Foo"
+
+    ti_min, buckets = 0x1000, 16
+    foo_bucket = get_hash_for_string("Foo") % buckets
+    other_bucket = (foo_bucket + 1) % buckets
+    hashes = struct.pack("<6I", foo_bucket, foo_bucket, foo_bucket, other_bucket, foo_bucket, other_bucket)
+    # One entry, in hash table bucket 0: name index 1 ("Foo") should find TI 0x1002 first.
+    adjustments = struct.pack("<7I", 1, 1, 1, 0b1, 0, 1, ti_min + 2)
+
+    header = PDBTypeStreamHeader()
+    header.ti_min, header.ti_max, header.buckets = ti_min, ti_min + 6, buckets
+    header.hash_value_buffer.offset, header.hash_value_buffer.byte_count = 0, len(hashes)
+    header.hash_adjustment_buffer.offset, header.hash_adjustment_buffer.byte_count = len(hashes), len(adjustments)
+    hash_stream = PdbTypeHashStream(hashes + adjustments, header, names=names)
+
+    assert hash_stream.get_possible_ti_for_string_by_hash("Foo") == [ti_min + 2, ti_min, ti_min + 1, ti_min + 4]
+
+    # Names that aren't valid UTF-8 come out as bytes, and are hashed as they are.
+    names = PdbStringTableStream(struct.pack("<III", STRING_TABLE_SIGNATURE, 1, 5) + b"\0F\xffo\0")
+    assert names.get_string(1) == b"F\xffo"
+    hash_stream = PdbTypeHashStream(hashes + adjustments, header, names=names)
+    assert hash_stream.adjustments == {hash_stream.truncate_hash(get_hash_for_string(b"F\xffo")): [ti_min + 2]}
+    assert get_hash_for_string(b"Foo") == get_hash_for_string("Foo")
+
+
+def test_named_streams():
+    pdb = PDB("example_pdbs/minimal.pdb")
+    assert pdb.info.get_named_stream_index("/names") == 7
+    assert pdb.info.get_named_stream_index("/nope") is None
+    assert pdb.names.get_string(1).endswith("minimal.cpp")
+
+
+def test_malformed_named_stream_map(monkeypatch):
+    header = PDBInfoHeader(version=20000404, age=1, byte_count_for_names=4)
+    names = b"/nam"  # No terminator
+    # Hash table with one entry: size, capacity, present bit vector, deleted bit vector, then the entry.
+    table = struct.pack("<IIIIIII", 1, 1, 1, 1, 0, 0, 7)
+    for info_bytes in (bytes(header) + names, bytes(header) + names + table[:6], bytes(header) + names + table):
+        info = PdbInfoStream(info_bytes)
+        assert info.named_streams == {}
+        assert info.get_named_stream_index("/names") is None
+
+    # With hash adjustments but no /names, the type stream opens without its hash stream.
+    class AdjustedTypeStream(PdbTypeStream):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.header.hash_adjustment_buffer.byte_count = 8
+
+    monkeypatch.setattr(pdb_module, "PdbTypeStream", AdjustedTypeStream)
+    monkeypatch.setattr(PdbInfoStream, "named_streams", {})
+    types = PDB("example_pdbs/minimal.pdb").types
+    assert types.hash_stream is None
+    ti, record = types.get_structy_by_name("Yolo")
+    assert (ti, record.unique_name) == (4099, ".?AUYolo@@")
+
+
+def test_type_name_index_without_hash_stream(setup_type_stream: PdbTypeStream):
+    type_stream = PdbTypeStream(setup_type_stream.file)
+    assert type_stream.hash_stream is None
+
+    ti, record = type_stream.get_structy_by_name("Yolo")
+    assert (ti, record.unique_name) == (4099, ".?AUYolo@@")
+    assert type_stream.name_index is not None
+
+    # Every named type the hash stream finds is found through the self-built index as well.
+    for _, info in setup_type_stream.iter_ti_headers():
+        record = setup_type_stream.get_by_type_index(info.ti)
+        name = getattr(record, "name", None)
+        if isinstance(name, str) and record.record_type in structy_types + (LeafID.ENUM,):
+            hashed = [found_ti for found_ti, _ in setup_type_stream.get_ti_and_record_for_name(name=name)]
+            indexed = [found_ti for found_ti, _ in type_stream.get_ti_and_record_for_name(name=name)]
+            assert info.ti in indexed
+            assert set(hashed) <= set(indexed)
+
+
+def make_type_stream(*records: bytes) -> PdbTypeStream:
+    """
+    Makes a type stream (without hash stream) out of records without their size prefix.
+    """
+    data = b"".join(struct.pack("<H", len(record)) + record for record in records)
+    header = PDBTypeStreamHeader()
+    header.header_size_bytes = ctypes.sizeof(header)
+    header.ti_min, header.ti_max, header.hash_key_size_bytes = 0x1000, 0x1000 + len(records), 4
+    header.records_byte_count = len(data)
+    return PdbTypeStream(bytes(header) + data)
+
+
+def test_resolve_forward():
+    def structure(name: str, forward: bool, unique_name: Optional[str] = None) -> bytes:
+        properties = TypeProperties()
+        properties.is_forward_definition = forward
+        properties.has_unique_name = unique_name is not None
+        names = name.encode() + b"\0" + (unique_name.encode() + b"\0" if unique_name else b"")
+        return struct.pack("<HH2sIIIH", LeafID.STRUCTURE, 0, bytes(properties), 0, 0, 0, 0) + names
+
+    def enum(name: str, forward: bool) -> bytes:
+        properties = TypeProperties()
+        properties.is_forward_definition = forward
+        return struct.pack("<HH2sII", LeafID.ENUM, 0, bytes(properties), 0x74, 0) + name.encode() + b"\0"
+
+    type_stream = make_type_stream(
+        structure("Foo", True, ".?AUFoo@@"),
+        structure("Foo", True, ".?AUFoo@Other@@"),  # Same name, different type.
+        enum("Foo", True),
+        structure("Foo", False, ".?AUFoo@Other@@"),
+        structure("Foo", False, ".?AUFoo@@"),
+        enum("Foo", False),
+        structure("Opaque", True),
+    )
+    assert [type_stream.resolve_forward(ti) for ti in range(0x1000, 0x1007)] == [
+        0x1004,
+        0x1003,
+        0x1005,
+        0x1003,
+        0x1004,
+        0x1005,
+        0x1006,  # Never defined, so it stays.
+    ]
+    assert type_stream.get_by_type_index(type_stream.resolve_forward(0x1000)).unique_name == ".?AUFoo@@"
+
+
+def test_type_record_cache(setup_type_stream: PdbTypeStream):
+    type_stream = PdbTypeStream(setup_type_stream.file, record_cache_entries=2)
+    cache = type_stream.record_cache
+
+    pointer = type_stream.get_by_type_index(ti=4100)
+    assert type_stream.get_by_type_index(ti=4100) is pointer
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+    assert cache.byte_count > 0
+
+    # Bounded by entries, oldest first.
+    type_stream.get_by_type_index(ti=4098)
+    type_stream.get_by_type_index(ti=4099)
+    assert ((4100, False) in cache, len(cache), cache.stats.evictions) == (False, 2, 1)
+
+    cache.invalidate((4099, False))
+    assert (4099, False) not in cache
+    cache.invalidate()
+    assert (len(cache), cache.byte_count) == (0, 0)
+    assert type_stream.get_by_type_index(ti=4100) is not pointer
+
+    # Bounded by bytes too.
+    cache.max_entries, cache.max_bytes = 100, 1
+    type_stream.get_by_type_index(ti=4098)
+    type_stream.get_by_type_index(ti=4099)
+    assert len(cache) == 1
+
+    # Lazy and eager records are cached apart, so asking for an eager record never gets a lazy one.
+    cache.max_bytes = 1024 * 1024
+    lazy_yolo = type_stream.get_by_type_index(ti=4099, lazy=True)
+    assert isinstance(lazy_yolo, LazyTypeStructLike)
+    assert not isinstance(type_stream.get_by_type_index(ti=4099), LazyTypeStructLike)
+    assert type_stream.get_by_type_index(ti=4099, lazy=True) is lazy_yolo
+
+
+def test_type_records_arent_shared_by_default(setup_type_stream: PdbTypeStream):
+    type_stream = PdbTypeStream(setup_type_stream.file)
+    assert type_stream.record_cache.max_entries == 0
+
+    # One caller changing or lazily decoding its record doesn't change what the next one gets.
+    fields = type_stream.get_by_type_index(ti=4098)
+    fields.members[0].addr += 1000
+    fields.members[0].name = "changed"
+    lazy_yolo = type_stream.get_by_type_index(ti=4099, lazy=True)
+    assert lazy_yolo.name == "Yolo"
+    lazy_yolo.name = "changed"
+
+    again = type_stream.get_by_type_index(ti=4098)
+    assert again is not fields
+    assert (again.members[0].name, again.members[0].addr) == ("x", fields.members[0].addr - 1000)
+    lazy_again = type_stream.get_by_type_index(ti=4099, lazy=True)
+    assert "name" not in lazy_again.__dict__ and lazy_again.name == "Yolo"
+
+
+def test_lazy_records(setup_type_stream: PdbTypeStream):
+    eager = PdbTypeStream(setup_type_stream.file, record_cache_entries=0)
+    lazy = PdbTypeStream(setup_type_stream.file, record_cache_entries=0)
+
+    yolo = lazy.get_by_type_index(4099, lazy=True)
+    assert isinstance(yolo, LazyTypeStructLike)
+    assert "name" not in yolo.__dict__  # Not decoded yet
+    assert (yolo.element_count, yolo.fields) == (3, 4098)
+    assert (yolo.name, yolo.unique_name, yolo.struct_size_bytes) == ("Yolo", ".?AUYolo@@", 16)
+    with pytest.raises(AttributeError):
+        yolo.not_an_attribute
+
+    fields = lazy.get_by_type_index(4098, lazy=True)
+    assert all(isinstance(member, LazyMember) for member in fields.members)
+    eager_fields = eager.get_by_type_index(4098)
+    for member, eager_member in zip(fields.members, eager_fields.members, strict=True):
+        assert member._tail is not None  # Not decoded yet
+        assert (member.name, member.offset, member.field_type) == (
+            eager_member.name,
+            eager_member.offset,
+            eager_member.field_type,
+        )
+
+    # Records without a lazy variant are parsed as usual.
+    assert isinstance(lazy.get_by_type_index(4100, lazy=True), Pointer)
+
+    records = list(lazy.iter_records(structy_types))
+    assert [ti for ti, _ in records] == [4099]
+    assert records[0][1].name == "Yolo"
+
+
+def test_lazy_field_list_index():
+    def member(leaf: LeafID, fixed: bytes, name: Optional[bytes] = None) -> bytes:
+        data = struct.pack("<H", leaf) + fixed + (b"" if name is None else name + b"\x00")
+        padding = -len(data) % 4
+        return data + bytes(0xF0 + padding - idx for idx in range(padding))
+
+    members = [
+        member(LeafID.BCLASS, struct.pack("<HIH", 3, 0x1005, 8)),
+        member(LeafID.VFUNCTAB, struct.pack("<HI", 0, 0x1006)),
+        *(member(LeafID.MEMBER, struct.pack("<HIH", 3, 0x74, idx * 4), b"member%d" % idx) for idx in range(300)),
+        member(LeafID.MEMBER, struct.pack("<HIHI", 3, 0x74, LeafID.ULONG, 0x12345678), b"far"),
+        member(LeafID.STMEMBER, struct.pack("<HI", 3, 0x74), b"static_member"),
+        member(LeafID.ENUMERATE, struct.pack("<HH", 3, 7), b"member0"),  # Same name, the first one is found
+        member(LeafID.ONEMETHOD, struct.pack("<HII", 3 | 4 << 2, 0x1007, 16), b"introducing"),
+        member(LeafID.ONEMETHOD, struct.pack("<HI", 3, 0x1008), b"plain"),
+        member(LeafID.METHOD, struct.pack("<HI", 2, 0x1009), b"overloaded"),
+        member(LeafID.NESTTYPE, struct.pack("<HI", 0, 0x100A), b"Nested"),
+        member(LeafID.INDEX, struct.pack("<HI", 0, 0x100B)),  # Not supported
+    ]
+    record = struct.pack("<H", LeafID.FIELDLIST) + b"".join(members)
+    mem = b"\xAA" * 6 + record
+
+    _, eager = FieldList.from_memory(mem, 6, len(record), debug=False)
+    end, fields = LazyFieldList.from_memory(mem, 6, len(record), debug=False)
+    assert end == 6 + len(record)
+    assert isinstance(fields.members, FieldListMembers)
+    assert len(fields.members) == len(eager.members) == len(members)
+
+    # Looking up a member by name only parses that one.
+    far = fields.find_member("far")
+    assert (far.offset, far.addr) == (0x12345678, eager.members[302].addr)
+    assert repr(fields.members) == f"FieldListMembers({len(members)} members, 1 parsed)"
+    assert fields.find_member("member0").offset == 0
+    assert fields.members.index_of("introducing") == 305
+    assert fields.find_member("Yolo") is None and eager.find_member("Yolo") is None
+
+    for lazy_member, eager_member in zip(fields.members, eager.members, strict=True):
+        assert type(lazy_member).__name__ == type(eager_member).__name__.replace("Member", "LazyMember")
+        assert lazy_member.addr == eager_member.addr
+        for name in (*getattr(eager_member, "extra_attributes", ()), "size_bytes"):
+            assert getattr(lazy_member, name, None) == getattr(eager_member, name, None), name
+    assert fields.members[-1].size_bytes == len(members[-1])
+    assert [member.name for member in fields.members[304:306]] == ["member0", "introducing"]
+
+
+def test_slotted_records(setup_type_stream: PdbTypeStream):
+    eager = PdbTypeStream(setup_type_stream.file, record_cache_entries=0)
+    slotted = PdbTypeStream(setup_type_stream.file, record_cache_entries=0, slotted_records=True)
+
+    def assert_same(slotted_record, record):
+        # Field list members are slotted either way, `__class__` is the record class they stand in for.
+        assert type(slotted_record) is slotted_variant(record.__class__)
+        assert not hasattr(slotted_record, "__dict__")
+        assert slotted_record == record
+        for name in type(slotted_record).attribute_slots:
+            assert hasattr(slotted_record, name) == hasattr(record, name), name
+            if name == "members":
+                for slotted_member, member in zip(slotted_record.members, record.members, strict=True):
+                    assert_same(slotted_member, member)
+            elif hasattr(record, name):
+                assert getattr(slotted_record, name) == getattr(record, name), name
+
+    for ti in range(eager.header.ti_min, eager.header.ti_max):
+        record = eager.get_by_type_index(ti)
+        if not isinstance(record, OpaqueRecord):
+            assert_same(slotted.get_by_type_index(ti), record)
+
+    # Slotted records can be lazy too, like the members of a lazy field list.
+    stream_offset, info = eager.get_ti_info(4098)
+    _, fields = slotted_variant(LazyFieldList).from_memory(eager.file, stream_offset + 2, info.size_bytes, False)
+    assert isinstance(fields.members, FieldListMembers)
+    for slotted_member, member in zip(fields.members, eager.get_by_type_index(4098).members, strict=True):
+        assert type(slotted_member) is slotted_variant(member.__class__.lazy_variant)
+        assert slotted_member._tail is not None  # Not decoded yet
+        assert slotted_member == member and slotted_member.name == member.name
+
+    lazy_yolo = slotted.get_by_type_index(4099, lazy=True)
+    assert type(lazy_yolo) is slotted_variant(LazyTypeStructLike)
+    assert isinstance(lazy_yolo, TypeStructLike) and lazy_yolo._tail is not None
+    assert (lazy_yolo.name, lazy_yolo.unique_name, lazy_yolo.struct_size_bytes) == ("Yolo", ".?AUYolo@@", 16)
+    assert not hasattr(lazy_yolo, "_tail")
+    with pytest.raises(AttributeError):
+        lazy_yolo.not_an_attribute
+
+    yolo = slotted.get_by_type_index(4099)
+    assert yolo.properties == TypeProperties(has_unique_name=1)
+    assert (yolo.name, yolo.unique_name) == ("Yolo", ".?AUYolo@@")
+    assert slotted.get_by_type_index(4100).attributes.kind == PointerTypeEnum.BITS_64
+
+
+def test_scans_dont_make_ctypes_records(
+    setup_type_stream: PdbTypeStream, setup_symbol_record_stream: PdbSymbolRecordStream, monkeypatch
+):
+    type_stream = PdbTypeStream(setup_type_stream.file, record_cache_entries=0)
+    # Only the field list that's handed out is a ctypes structure, not its members.
+    fields = type_stream.get_by_type_index(4098)
+    expected_names = [member.name for member in fields.members]
+    expected_symbols = [symbol.name for symbol in setup_symbol_record_stream.symbols()]
+
+    def no_ctypes(*args):
+        raise AssertionError("Made a ctypes record")
+
+    for typ in {*records_by_id.values(), *associate_symbols.registry.values()} - {FieldList}:
+        monkeypatch.setattr(typ, "from_buffer_copy", no_ctypes)
+    with pytest.raises(AssertionError):
+        LazyMember.from_buffer_copy(bytes(8))
+
+    for lazy in (False, True):
+        members = type_stream.get_by_type_index(4098, lazy=lazy).members
+        assert [member.name for member in members] == expected_names
+        assert all(isinstance(member, Member) for member in members)
+    records = dict(type_stream.iter_records())
+    assert records[4099].name == "Yolo" and isinstance(records[4099], TypeStructLike)
+    assert dict(type_stream.iter_records(lazy=False))[4099].unique_name == ".?AUYolo@@"
+    symbols = list(setup_symbol_record_stream.symbols())
+    assert [symbol.name for symbol in symbols] == expected_symbols
+    assert all(isinstance(symbol, DataSym) for symbol in symbols)
+
+
+def test_unsupported_records_are_opaque(setup_type_stream: PdbTypeStream, capsys):
+    # minimal.pdb starts with an argument list, which isn't supported
+    skipped_before = unsupported_leaves[LeafID.ARGLIST]
+    stream_offset, info = setup_type_stream.get_ti_info(4096)
+    assert info.record_type == LeafID.ARGLIST
+
+    record = PdbTypeStream(setup_type_stream.file, record_cache_entries=0).get_by_type_index(4096)
+    assert isinstance(record, OpaqueRecord)
+    assert (record.ti, record.leaf) == (4096, LeafID.ARGLIST)
+    assert (record.addr, record.size_bytes) == (stream_offset + 2, info.size_bytes)
+    assert unsupported_leaves[LeafID.ARGLIST] == skipped_before + 1
+    assert capsys.readouterr().out == ""
+
+    records = dict(setup_type_stream.iter_records())
+    assert isinstance(records[4096], OpaqueRecord)
+    assert records[4099].name == "Yolo"
+
+    # Members don't know their size, so an unsupported one is the rest of the field list.
+    known = struct.pack("<HHIH", LeafID.MEMBER, 3, 0x74, 0) + b"x\x00\xf2\xf1"
+    unknown = struct.pack("<HHI", LeafID.INDEX, 0, 0x1005)
+    field_list = struct.pack("<H", LeafID.FIELDLIST) + known + unknown
+    end, fields = FieldList.from_memory(b"\xAA" * 6 + field_list, 6, len(field_list), debug=False)
+    assert end == 6 + len(field_list)
+    member, opaque = fields.members
+    assert (member.name, member.addr) == ("x", 8)
+    assert isinstance(opaque, OpaqueRecord) and opaque.leaf == LeafID.INDEX
+    assert (opaque.addr, opaque.size_bytes) == (8 + len(known), len(unknown))
+
+
+@pytest.mark.parametrize(
+    "ctype",
+    sorted(
+        {*records_by_id.values(), *associate_symbols.registry.values(), PDBTypeStreamHeader, SymbolInformation},
+        key=lambda ctype: ctype.__name__,
+    ),
+    ids=lambda ctype: ctype.__name__,
+)
+def test_struct_decoders_match_ctypes(ctype):
+    decoder = get_decoder(ctype)
+    assert decoder.size == ctypes.sizeof(ctype)
+
+    rng = random.Random(ctype.__name__)
+    for _ in range(50):
+        data = bytes(rng.getrandbits(8) for _ in range(decoder.size + 3))
+        expected = ctype.from_buffer_copy(data[3:])
+        for name, value in zip(decoder.names, decoder.unpack_from(data, 3), strict=True):
+            ctypes_value = expected
+            for part in name.split("."):
+                ctypes_value = getattr(ctypes_value, part)
+            if isinstance(ctypes_value, ctypes.Array):
+                ctypes_value = bytes(ctypes_value) if isinstance(value, bytes) else tuple(ctypes_value)
+            assert value == ctypes_value, name
+
+
+def test_record_lookups_dont_copy_scattered_streams(setup_windows_pdb: MultiStreamFile):
+    msf = setup_windows_pdb
+    page_size = msf.page_size
+    # The type stream (page 20), followed by pages that aren't next to it or each other
+    stream = MultiStreamFileStream(msf, page_list=[20, 2, 9], size_bytes=3 * page_size, streamname="scattered")
+    types = PdbTypeStream(stream, record_cache_entries=0)
+
+    # Struct records read their size as a numeric leaf, straight from the stream.
+    yolo = types.get_by_type_index(4099)
+    assert (yolo.name, yolo.struct_size_bytes) == ("Yolo", 16)
+    assert types.get_by_type_index(4098).members[0].name == "x"
+    assert stream.memorywrapper_copied is None
+
+
+@pytest.mark.parametrize("leaf", LeafNumericToCType, ids=lambda leaf: leaf.name)
+def test_read_numeric_matches_ctypes(leaf: LeafID):
+    ctype = LeafNumericToCType[leaf]
+    data = struct.pack("<H", leaf) + bytes(range(0x81, 0x81 + ctypes.sizeof(ctype)))
+    post_read_offset, value = read_numeric(memoryview(data), 0)
+    expected = ctype.from_buffer_copy(data[2:])
+    assert post_read_offset == len(data)
+    assert value == (bytes(expected) if isinstance(expected, ctypes.Array) else expected.value)
+
+
 def test_type_lookup_by_type_name(setup_type_stream: PdbTypeStream):
     for ti, record in setup_type_stream.get_ti_and_record_for_name(name="Yolo"):
         assert ti == 4099